@@ -10,6 +10,10 @@ import risk.play_game as play
 try:
     training.train(num_episodes=30_000, eval_interval=200) # play more games
     
+    # generate experiences once and train on them offline
+    #training.generate_experience_shards('risk/experience_shards', num_games=10_000)
+    #training.train_from_shards('risk/experience_shards', num_epochs=3)
+
     # test loading checkpoint
     #training.train(num_episodes=100, eval_interval=50, checkpoint_path='risk/model_checkpoints/rl_model_checkpoint_episode_100_2024_12_04_14_54.pt') # play more games
 except Exception as e:
@@ -1,6 +1,21 @@
 from __future__ import annotations
 
+# view over the soldiers of a single territory in a GameState
 class Army:
-    def __init__(self, owner: Player, n_soldiers: int):
-        self.owner = owner
-        self.n_soldiers = n_soldiers
+    def __init__(self, state: GameState, idx: int, player_by_id: List[Player]):
+        self.state = state
+        self.idx = idx
+        self.player_by_id = player_by_id
+
+    @property
+    def n_soldiers(self) -> int:
+        return int(self.state.troops[self.idx])
+
+    @n_soldiers.setter
+    def n_soldiers(self, value: int):
+        self.state.troops[self.idx] = value
+
+    @property
+    def owner(self) -> Player:
+        pid = self.state.owners[self.idx]
+        return self.player_by_id[pid] if pid >= 0 else None
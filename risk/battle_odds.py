@@ -0,0 +1,82 @@
+import numpy as np
+from risk.dice import DEFAULT_MAX_ARMIES, get_battle_outcome_table
+
+# exact odds of a full attack (attacking until conquest or until all committed armies are lost)
+# for every (attackers, defenders) pair up to max_armies, derived once from the dynamic programming
+# table in risk.dice and stored as arrays, so that a lookup is O(1).
+# attackers is the number of committed armies, i.e. the soldiers in the attacking country minus
+# the ones staying behind (n_soldiers - 1 for an attack with everything)
+class BattleOdds:
+    def __init__(self, max_armies: int = DEFAULT_MAX_ARMIES):
+        self.max_armies = max_armies
+        probs = get_battle_outcome_table(max_armies).probs # [attackers, defenders, outcome]
+
+        n = max_armies + 1
+        attackers_left = np.zeros(probs.shape[2])
+        attackers_left[1:n] = np.arange(1, n)
+        defenders_left = np.zeros(probs.shape[2])
+        defenders_left[n:] = np.arange(1, n)
+
+        self.conquest_probability_table = probs[:, :, 1:n].sum(axis=2)
+        self.expected_attackers_left_table = probs @ attackers_left
+        self.expected_defenders_left_table = probs @ defenders_left
+        self.expected_attacker_losses_table = np.arange(n)[:, None] - self.expected_attackers_left_table
+
+    # armies beyond max_armies are scaled down together, which keeps the ratio of the armies
+    # but underestimates the odds of the stronger side, the odds of a larger battle are more
+    # extreme. e.g. 100 against 80 (scaled to 64 against 51) has a conquest probability of
+    # 0.960 from the table and 0.986 in a simulation (see tests/test_battle_odds.py)
+    def index(self, attackers, defenders):
+        if np.isscalar(attackers) and np.isscalar(defenders):
+            largest = max(attackers, defenders)
+            if largest > self.max_armies:
+                scale = self.max_armies / largest
+                attackers = max(1, round(attackers * scale)) if attackers > 0 else 0
+                defenders = max(1, round(defenders * scale)) if defenders > 0 else 0
+            return attackers, defenders
+
+        attackers = np.asarray(attackers)
+        defenders = np.asarray(defenders)
+        scale = np.minimum(1.0, self.max_armies / np.maximum(np.maximum(attackers, defenders), 1))
+        attackers = np.where(attackers > 0, np.maximum(1, np.rint(attackers * scale)), 0).astype(np.int64)
+        defenders = np.where(defenders > 0, np.maximum(1, np.rint(defenders * scale)), 0).astype(np.int64)
+        return attackers, defenders
+
+    def conquest_probability(self, attackers, defenders):
+        return self.conquest_probability_table[self.index(attackers, defenders)]
+
+    def expected_attacker_losses(self, attackers, defenders):
+        a, d = self.index(attackers, defenders)
+        scale = np.asarray(attackers) / np.maximum(a, 1)
+        return self.expected_attacker_losses_table[a, d] * scale
+
+    # returns (expected attackers left, expected defenders left)
+    def expected_remaining_troops(self, attackers, defenders):
+        a, d = self.index(attackers, defenders)
+        attacker_scale = np.asarray(attackers) / np.maximum(a, 1)
+        defender_scale = np.asarray(defenders) / np.maximum(d, 1)
+        return (
+            self.expected_attackers_left_table[a, d] * attacker_scale,
+            self.expected_defenders_left_table[a, d] * defender_scale
+        )
+
+_battle_odds = None
+def get_battle_odds() -> BattleOdds:
+    global _battle_odds
+    if _battle_odds is None:
+        _battle_odds = BattleOdds()
+    return _battle_odds
+
+# sets the largest army size with exact odds, larger armies are approximated (see BattleOdds.index)
+def configure(max_armies: int):
+    global _battle_odds
+    _battle_odds = BattleOdds(max_armies)
+
+def conquest_probability(attackers, defenders):
+    return get_battle_odds().conquest_probability(attackers, defenders)
+
+def expected_attacker_losses(attackers, defenders):
+    return get_battle_odds().expected_attacker_losses(attackers, defenders)
+
+def expected_remaining_troops(attackers, defenders):
+    return get_battle_odds().expected_remaining_troops(attackers, defenders)
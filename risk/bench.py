@@ -0,0 +1,173 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from datetime import datetime
+import numpy as np
+
+from risk.game import Game
+from risk.vec_game import VecGame
+from risk.player_heuristic import PlayerHeuristic
+from risk.player_random import PlayerRandom
+from risk.game_stats import GameStats
+
+def make_random_players():
+    return [PlayerRandom(f"Player Random {i}") for i in range(1, 6)]
+
+def make_heuristic_players():
+    return [PlayerHeuristic(f"Player Heuristic {i}") for i in range(1, 6)]
+
+# the lineup of train_rl.train with an untrained model, needs torch
+def make_mixed_players_factory():
+    from risk.train_rl import make_model, make_training_players
+    model = make_model('cpu')
+    return lambda: make_training_players(model, 'cpu')
+
+# plays num_games fixed seed games of a lineup to the end (also without RL players), unrecorded
+# like the games of training and eval. the decisions are counted by the game stats, which adds
+# a few timer calls per phase to the game time
+def bench_games(make_players, num_games, num_envs, seed):
+    vec_game = VecGame(make_players, num_envs, seed=seed, display_map=False, log_all=False, eval_log=False, stop_without_rl=False, stats=True)
+    games = []
+    stats = GameStats()
+    start = time.perf_counter()
+    for game, _ in vec_game.play(num_games):
+        games.append(game)
+        stats.merge(game.stats)
+    seconds = time.perf_counter() - start
+
+    decisions = stats.counters.get('decisions', 0)
+    return {
+        'games': num_games,
+        'seconds': seconds,
+        'games_per_sec': num_games / seconds,
+        'decisions': decisions,
+        'decisions_per_sec': decisions / seconds,
+        'mean_rounds': float(np.mean([game.num_rounds_played for game in games])),
+    }
+
+# best time per call over repeat runs of timeit's autorange
+def time_per_call(fn, repeat=5):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {'us_per_call': best * 1e6, 'calls': number * repeat}
+
+# a fixed position in the middle of a seeded heuristic game
+def bench_position(seed):
+    game = Game(make_heuristic_players(), display_map=False, log_all=False, seed=seed, record=True, stop_without_rl=False)
+    game.gameplay_loop()
+    return Game.replay(game.record, num_actions=len(game.record.actions()) // 2)
+
+def bench_engine_calls(seed, repeat):
+    game = bench_position(seed)
+    player = game.current_player
+    state = game.state
+    results = {}
+
+    # the encoder is incremental, so every call changes one territory like a real decision does
+    own_country = int(state.player_countries(player.pid)[0])
+    step = [1]
+    def encode_after_change():
+        state.troops[own_country] += step[0]
+        step[0] = -step[0]
+        game.get_game_state_encoded(player)
+    results['get_game_state_encoded'] = time_per_call(encode_after_change, repeat)
+    results['get_attack_options_encoded'] = time_per_call(lambda: game.get_attack_options_encoded(player), repeat)
+    results['get_fortify_options'] = time_per_call(lambda: game.get_fortify_options(player), repeat)
+
+    # a 3 dice battle between two armies that are too large to run out
+    table = game.topology.action_table
+    valid = table.valid_action_mask(state.owners, state.troops, player.pid)[:-1]
+    attack = int(np.flatnonzero(valid)[0])
+    attacker_country = game.countries[table.attackers[attack]]
+    defender_country = game.countries[table.defenders[attack]]
+    state.troops[attacker_country.idx] = state.troops[defender_country.idx] = 10**6
+    results['battle'] = time_per_call(lambda: game.battle(attacker_country, defender_country, 3), repeat)
+    return results
+
+def bench_model_calls(seed, repeat, batch_size=32, train_batch_size=256):
+    import torch
+    from risk.train_rl import make_model, compute_policy_loss
+
+    torch.manual_seed(seed)
+    game = bench_position(seed)
+    model = make_model('cpu')
+    state = torch.as_tensor(np.asarray(game.get_game_state_encoded(game.current_player)), dtype=torch.float)
+    num_actions = game.topology.action_table.n_actions
+    results = {}
+
+    with torch.inference_mode():
+        single = state.unsqueeze(0)
+        batch = state.expand(batch_size, *state.shape).contiguous()
+        results['gnn_forward_1'] = time_per_call(lambda: model(single), repeat)
+        results[f'gnn_forward_{batch_size}'] = time_per_call(lambda: model(batch), repeat)
+
+    states = state.expand(train_batch_size, *state.shape).contiguous()
+    masks = torch.ones(train_batch_size, num_actions, dtype=torch.bool)
+    actions = torch.randint(num_actions, (train_batch_size,))
+    rewards = torch.randn(train_batch_size)
+    def forward_backward():
+        model.zero_grad()
+        compute_policy_loss(model, states, masks, actions, rewards).backward()
+    results[f'gnn_forward_backward_{train_batch_size}'] = time_per_call(forward_backward, repeat)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# all benchmarks as one json serializable dict, the model benchmarks and the mixed lineup
+# are skipped (with the reason) if torch is not installed
+def run(num_games=20, num_envs=16, seed=0, repeat=5):
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'seed': seed,
+        'games': {},
+        'calls': {},
+        'skipped': {},
+    }
+
+    lineups = {'random': make_random_players, 'heuristic': make_heuristic_players}
+    try:
+        import torch
+        results['torch'] = torch.__version__
+        torch.set_num_threads(1)
+        lineups['mixed'] = make_mixed_players_factory()
+    except ImportError as e:
+        results['skipped']['mixed'] = results['skipped']['model'] = str(e)
+
+    for name, make_players in lineups.items():
+        results['games'][name] = bench_games(make_players, num_games, num_envs, seed)
+    results['calls'].update(bench_engine_calls(seed, repeat))
+    if 'model' not in results['skipped']:
+        results['calls'].update(bench_model_calls(seed, repeat))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m risk.bench', description="Benchmarks of the game engine and the RL model, printed as json")
+    parser.add_argument('--games', type=int, default=20, help="games per player lineup")
+    parser.add_argument('--num-envs', type=int, default=16, help="games played in lockstep (see VecGame)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help="timing runs per call benchmark, the best is reported")
+    parser.add_argument('--output', help="write the json to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = run(args.games, args.num_envs, args.seed, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
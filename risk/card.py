@@ -13,6 +13,9 @@ class CardType(Enum):
     def __repr__(self):
         return self.value
 
+CARD_TYPES = list(CardType)
+CARD_TYPE_IDX = {card_type: i for i, card_type in enumerate(CARD_TYPES)}
+
 class Card:
     def __init__(self, card_type: CardType):
         self.card_type = card_type
@@ -26,13 +29,16 @@ class Card:
     def __str__(self):
         return self.card_type.value
     
-def init_deck():
-    deck = [Card(CardType.INFANTRY)]*14 + \
-        [Card(CardType.CAVALRY)]*14 + \
-        [Card(CardType.ARTILLERY)]*14 
+N_CARDS_PER_TYPE = 14
+DECK_SIZE = N_CARDS_PER_TYPE * len(CardType)
+
+def init_deck(rng=random):
+    deck = [Card(CardType.INFANTRY)]*N_CARDS_PER_TYPE + \
+        [Card(CardType.CAVALRY)]*N_CARDS_PER_TYPE + \
+        [Card(CardType.ARTILLERY)]*N_CARDS_PER_TYPE 
         #[Card(CardType.WILDCARD)]*2
 
-    random.shuffle(deck)
+    rng.shuffle(deck)
     return deck
 
 trade_in_map = [4, 6, 8, 10, 12, 15]
@@ -1,19 +1,38 @@
 from __future__ import annotations
 from typing import List
+import numpy as np
+from risk.army import Army
 
+# the module level countries below only describe the map, each game works on
+# its own bound copies (see bind), which are thin views over the owner and
+# soldiers stored in the GameState arrays of that game
 class Country:
     def __init__(self, name: str):
         self.name = name
+        self.idx: int = None # position in the GameState arrays
         self.continent: Continent = None
+        self.game = None
         self._army = None
 
+    def bind(self, game) -> Country:
+        country = Country(self.name)
+        country.idx = self.idx
+        country.continent = self.continent
+        country.game = game
+        country._army = Army(game.state, self.idx, game.player_by_id)
+        return country
+
     @property
     def army(self) -> Army:
         return self._army
 
-    @army.setter
-    def army(self, value):
-        self._army = value
+    @property
+    def owner(self) -> Player:
+        return self._army.owner if self._army else None
+
+    @owner.setter
+    def owner(self, player: Player):
+        self.game.state.set_owner(self.idx, player.pid)
 
     def __str__(self):
         soldiers = self.army.n_soldiers if self.army else 0
@@ -38,6 +57,7 @@ class Continent:
         self.name = name
         self.countries = countries
         self.extra_points = extra_points
+        self.country_idx = np.array(sorted(c.idx for c in countries))
 
     def __str__(self):
         return self.name
@@ -78,6 +98,10 @@ country_instances = {}
 for country_name in sum(continent_countries.values(), []):
     country_instances[country_name] = Country(country_name)
 
+# territory index used by GameState is the alphabetical order of the country names
+for idx, country in enumerate(sorted(country_instances.values())):
+    country.idx = idx
+
 continent_instances = []
 
 for continent_name, country_names in continent_countries.items():
@@ -96,3 +120,100 @@ for var_name, country in country_instances.items():
 
 COUNTRIES = list(country_instances.values())
 CONTINENTS = continent_instances
+
+# every border of the map as a pair of country names (some are listed twice), the order
+# of the list defines the neighbor order of the countries, see risk.topology
+BORDERS = [
+    ('Alaska', 'NorthwestTerritory'),
+    ('Alaska', 'Alberta'),
+    ('NorthwestTerritory', 'Alberta'),
+    ('NorthwestTerritory', 'Ontario'),
+    ('NorthwestTerritory', 'Greenland'),
+    ('Alberta', 'Ontario'),
+    ('Alberta', 'WesternUS'),
+    ('Ontario', 'Quebec'),
+    ('Ontario', 'EasternUS'),
+    ('Ontario', 'WesternUS'),
+    ('Quebec', 'EasternUS'),
+    ('Quebec', 'Greenland'),
+    ('WesternUS', 'EasternUS'),
+    ('WesternUS', 'CentralAmerica'),
+    ('EasternUS', 'CentralAmerica'),
+    ('Venezuela', 'CentralAmerica'),
+    ('Venezuela', 'Brazil'),
+    ('Venezuela', 'Peru'),
+    ('Brazil', 'Peru'),
+    ('Brazil', 'Argentina'),
+    ('Brazil', 'NorthAfrica'),
+    ('Peru', 'Argentina'),
+    ('Iceland', 'Greenland'),
+    ('Iceland', 'GreatBritain'),
+    ('Iceland', 'Scandinavia'),
+    ('GreatBritain', 'Scandinavia'),
+    ('GreatBritain', 'NorthernEurope'),
+    ('GreatBritain', 'WesternEurope'),
+    ('Scandinavia', 'NorthernEurope'),
+    ('NorthernEurope', 'Ukraine'),
+    ('NorthernEurope', 'SouthernEurope'),
+    ('NorthernEurope', 'WesternEurope'),
+    ('Ukraine', 'Scandinavia'),
+    ('Ukraine', 'SouthernEurope'),
+    ('Ukraine', 'Ural'),
+    ('Ukraine', 'Afghanistan'),
+    ('Ukraine', 'MiddleEast'),
+    ('WesternEurope', 'SouthernEurope'),
+    ('SouthernEurope', 'Egypt'),
+    ('SouthernEurope', 'MiddleEast'),
+    ('NorthAfrica', 'Brazil'),
+    ('NorthAfrica', 'WesternEurope'),
+    ('NorthAfrica', 'Egypt'),
+    ('NorthAfrica', 'EastAfrica'),
+    ('NorthAfrica', 'Congo'),
+    ('Egypt', 'EastAfrica'),
+    ('Egypt', 'MiddleEast'),
+    ('EastAfrica', 'Congo'),
+    ('EastAfrica', 'SouthAfrica'),
+    ('EastAfrica', 'Madagascar'),
+    ('Congo', 'SouthAfrica'),
+    ('SouthAfrica', 'Madagascar'),
+    ('Ural', 'Siberia'),
+    ('Ural', 'China'),
+    ('Ural', 'Afghanistan'),
+    ('Siberia', 'Yakutsk'),
+    ('Siberia', 'Irkutsk'),
+    ('Siberia', 'Mongolia'),
+    ('Siberia', 'China'),
+    ('Yakutsk', 'Irkutsk'),
+    ('Irkutsk', 'Mongolia'),
+    ('Irkutsk', 'Kamchatka'),
+    ('Kamchatka', 'Yakutsk'),
+    ('Kamchatka', 'Japan'),
+    ('Kamchatka', 'Mongolia'),
+    ('Mongolia', 'China'),
+    ('Mongolia', 'Japan'),
+    ('China', 'Mongolia'),
+    ('China', 'India'),
+    ('China', 'Siam'),
+    ('India', 'Siam'),
+    ('India', 'MiddleEast'),
+    ('Afghanistan', 'China'),
+    ('Afghanistan', 'India'),
+    ('Afghanistan', 'MiddleEast'),
+    ('Indonesia', 'Siam'),
+    ('Indonesia', 'NewGuinea'),
+    ('Indonesia', 'WesternAustralia'),
+    ('NewGuinea', 'EasternAustralia'),
+    ('NewGuinea', 'WesternAustralia'),
+    ('EasternAustralia', 'WesternAustralia'),
+    ('Alaska', 'Kamchatka'),
+    ('Greenland', 'Iceland'),
+    ('Brazil', 'NorthAfrica'),
+    ('SouthernEurope', 'Egypt'),
+    ('WesternEurope', 'NorthAfrica'),
+    ('SouthernEurope', 'NorthAfrica'),
+    ('EastAfrica', 'MiddleEast'),
+    ('Ukraine', 'Ural'),
+    ('Ukraine', 'Afghanistan'),
+    ('Ukraine', 'MiddleEast'),
+    ('Siam', 'Indonesia'),
+]
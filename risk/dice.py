@@ -0,0 +1,128 @@
+import bisect
+import itertools
+import random
+import numpy as np
+
+MAX_ATTACK_DICE = 3
+MAX_DEFEND_DICE = 2
+DEFAULT_MAX_ARMIES = 64
+
+# exact distribution of (attacker_loss, defender_loss) for a single roll of n_attack against
+# n_defend dice, by enumerating all 6^(n_attack + n_defend) rolls
+def exchange_distribution(n_attack: int, n_defend: int):
+    counts = {}
+    for rolls in itertools.product(range(1, 7), repeat=n_attack + n_defend):
+        attack_rolls = sorted(rolls[:n_attack], reverse=True)
+        defend_rolls = sorted(rolls[n_attack:], reverse=True)
+        attacker_loss = 0
+        defender_loss = 0
+        for a, d in zip(attack_rolls, defend_rolls):
+            if a > d:
+                defender_loss += 1
+            else:
+                attacker_loss += 1
+        counts[(attacker_loss, defender_loss)] = counts.get((attacker_loss, defender_loss), 0) + 1
+
+    n_rolls = 6 ** (n_attack + n_defend)
+    return {losses: count / n_rolls for losses, count in sorted(counts.items())}
+
+# EXCHANGE_TABLE[n_attack][n_defend] = (list of (attacker_loss, defender_loss), cumulative probabilities)
+EXCHANGE_TABLE = [[None] * (MAX_DEFEND_DICE + 1) for _ in range(MAX_ATTACK_DICE + 1)]
+for n_attack in range(1, MAX_ATTACK_DICE + 1):
+    for n_defend in range(1, MAX_DEFEND_DICE + 1):
+        distribution = exchange_distribution(n_attack, n_defend)
+        EXCHANGE_TABLE[n_attack][n_defend] = (
+            list(distribution.keys()),
+            list(itertools.accumulate(distribution.values()))
+        )
+
+# uniform random numbers of a numpy Generator, generated in blocks of block_size with one call
+# and handed out one at a time, for the hot loops that need a single number per call (dice,
+# random players). has the random/randint/choice interface of the random module it replaces
+class RandomStream:
+    def __init__(self, rng: np.random.Generator, block_size: int = 4096):
+        self.rng = rng
+        self.block_size = block_size
+        self.block = []
+        self.pos = 0
+
+    def refill(self):
+        self.block = self.rng.random(self.block_size).tolist()
+        self.pos = 0
+
+    def random(self) -> float:
+        if self.pos == len(self.block):
+            self.refill()
+        u = self.block[self.pos]
+        self.pos += 1
+        return u
+
+    # integer in [a, b], both included
+    def randint(self, a: int, b: int) -> int:
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    # copy drawing from rng, which must be a copy of the Generator of this stream
+    def copy(self, rng: np.random.Generator) -> 'RandomStream':
+        stream = RandomStream(rng, self.block_size)
+        stream.block = self.block
+        stream.pos = self.pos
+        return stream
+
+def sample_exchange(n_attack: int, n_defend: int, rng=random):
+    losses, cumulative_probs = EXCHANGE_TABLE[n_attack][n_defend]
+    idx = bisect.bisect_right(cumulative_probs, rng.random())
+    return losses[min(idx, len(losses) - 1)] # guard against rounding in the last cumulative prob
+
+# an attack of a committed attacking armies against d defending armies, that continues until
+# the defender is conquered or all committed armies are lost, is an absorbing Markov chain on
+# (a, d): every exchange rolls min(3, a) against min(2, d) dice. the final state distribution
+# for every start (a, d) up to max_armies is computed once by dynamic programming.
+# outcomes are indexed so that k in [1, max_armies] means the attacker conquered with k armies
+# left and max_armies + k means the defender held with k armies left
+class BattleOutcomeTable:
+    def __init__(self, max_armies: int = DEFAULT_MAX_ARMIES):
+        self.max_armies = max_armies
+        n = max_armies + 1
+        probs = np.zeros((n, n, 2 * max_armies + 1))
+        for a in range(1, n):
+            probs[a, 0, a] = 1.0
+        for d in range(1, n):
+            probs[0, d, max_armies + d] = 1.0
+
+        # every exchange reduces a + d, so the final distributions of the smaller states are known
+        for a in range(1, n):
+            for d in range(1, n):
+                losses, cumulative_probs = EXCHANGE_TABLE[min(MAX_ATTACK_DICE, a)][min(MAX_DEFEND_DICE, d)]
+                prev = 0.0
+                for (attacker_loss, defender_loss), cumulative_prob in zip(losses, cumulative_probs):
+                    probs[a, d] += (cumulative_prob - prev) * probs[a - attacker_loss, d - defender_loss]
+                    prev = cumulative_prob
+
+        self.probs = probs
+        self.cumulative_probs = np.cumsum(probs, axis=2)
+
+    # returns (attacker armies left, defender armies left), one of them is 0
+    def sample(self, attackers: int, defenders: int, rng=random):
+        # too large battles are fought exchange by exchange until they fit in the table
+        while attackers > self.max_armies or defenders > self.max_armies:
+            attacker_loss, defender_loss = sample_exchange(min(MAX_ATTACK_DICE, attackers), min(MAX_DEFEND_DICE, defenders), rng)
+            attackers -= attacker_loss
+            defenders -= defender_loss
+            if attackers == 0 or defenders == 0:
+                return attackers, defenders
+
+        cumulative_probs = self.cumulative_probs[attackers, defenders]
+        k = int(np.searchsorted(cumulative_probs, rng.random(), side='right'))
+        k = min(k, len(cumulative_probs) - 1)
+        if k <= self.max_armies:
+            return k, 0
+        return 0, k - self.max_armies
+
+_outcome_tables = {}
+def get_battle_outcome_table(max_armies: int = DEFAULT_MAX_ARMIES) -> BattleOutcomeTable:
+    if max_armies not in _outcome_tables:
+        _outcome_tables[max_armies] = BattleOutcomeTable(max_armies)
+    return _outcome_tables[max_armies]
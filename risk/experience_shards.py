@@ -0,0 +1,147 @@
+import json
+import os
+import numpy as np
+import torch
+
+SHARD_SCHEMA_VERSION = 1
+EPISODE_OFFSETS_FILE = 'episode_offsets.bin'
+
+def discounted_returns(rewards: np.ndarray, gamma: float) -> np.ndarray:
+    returns = np.zeros(len(rewards))
+    R = 0.0
+    for i in range(len(rewards) - 1, -1, -1):
+        R = rewards[i] + gamma * R
+        returns[i] = R
+    return returns
+
+# append-only experience shards on disk. a shard is a directory with one raw binary file per
+# field (fixed dtype and per step shape, described in meta.json) and the step offsets of the
+# episodes, so a shard can be appended to by writing bytes and read back with np.memmap.
+# the discounted returns of every episode are computed when the episode is written
+class ShardWriter:
+    def __init__(self, directory, max_steps_per_shard=1_000_000, gamma=0.99):
+        self.directory = directory
+        self.max_steps_per_shard = max_steps_per_shard
+        self.gamma = gamma
+        os.makedirs(directory, exist_ok=True)
+        # after the highest existing shard, also counting the incomplete shard directories of an
+        # interrupted writer (without meta.json), which the readers skip
+        shard_ids = [int(name[len('shard_'):]) for name in os.listdir(directory) if name.startswith('shard_') and name[len('shard_'):].isdigit()]
+        self.shard_idx = max(shard_ids, default=-1) + 1
+        self.shard_dir = None
+        self.num_steps = 0
+
+    def open_shard(self, buffer):
+        self.shard_dir = os.path.join(self.directory, f'shard_{self.shard_idx:05d}')
+        self.shard_idx += 1
+        self.num_steps = 0
+        os.makedirs(self.shard_dir)
+
+        fields = {
+            name: {'dtype': array.dtype.str, 'shape': list(array.shape[1:])}
+            for name, array in buffer.arrays.items()
+        }
+        fields['return'] = {'dtype': np.dtype(np.float64).str, 'shape': []}
+        self.fields = fields
+        meta = {
+            'version': SHARD_SCHEMA_VERSION,
+            'num_actions': buffer.num_actions,
+            'gamma': self.gamma,
+            'edge_index': None if buffer.edge_index is None else np.asarray(buffer.edge_index).tolist(),
+            'fields': fields,
+        }
+        with open(os.path.join(self.shard_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        np.zeros(1, dtype=np.int64).tofile(os.path.join(self.shard_dir, EPISODE_OFFSETS_FILE))
+
+    # writes the steps of a RolloutBuffer as one episode
+    def append(self, buffer):
+        if len(buffer) == 0:
+            return
+        if self.shard_dir is None or self.num_steps + len(buffer) > self.max_steps_per_shard:
+            self.open_shard(buffer)
+        assert all(self.fields[name]['dtype'] == array.dtype.str for name, array in buffer.arrays.items()), "the schema of a shard is fixed"
+
+        arrays = {name: array[:len(buffer)] for name, array in buffer.arrays.items()}
+        arrays['return'] = discounted_returns(arrays['reward'], self.gamma)
+        for name, array in arrays.items():
+            with open(os.path.join(self.shard_dir, f'{name}.bin'), 'ab') as f:
+                np.ascontiguousarray(array).tofile(f)
+
+        self.num_steps += len(buffer)
+        with open(os.path.join(self.shard_dir, EPISODE_OFFSETS_FILE), 'ab') as f:
+            np.array([self.num_steps], dtype=np.int64).tofile(f)
+
+def list_shards(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith('shard_') and os.path.exists(os.path.join(directory, name, 'meta.json'))
+    )
+
+# the steps of all complete episodes in a shard, as read only memory maps
+class Shard:
+    def __init__(self, shard_dir):
+        with open(os.path.join(shard_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.num_actions = self.meta['num_actions']
+
+        # a partially written episode at the end (e.g. an interrupted writer) is ignored
+        self.episode_offsets = np.fromfile(os.path.join(shard_dir, EPISODE_OFFSETS_FILE), dtype=np.int64)
+        self.num_steps = int(self.episode_offsets[-1])
+        self.num_episodes = len(self.episode_offsets) - 1
+
+        self.arrays = {}
+        for name, field in self.meta['fields'].items():
+            path = os.path.join(shard_dir, f'{name}.bin')
+            shape = (self.num_steps, *field['shape'])
+            if self.num_steps == 0:
+                self.arrays[name] = np.zeros(shape, dtype=field['dtype'])
+            else:
+                self.arrays[name] = np.memmap(path, dtype=field['dtype'], mode='r', shape=shape)
+
+# all shards of a directory as one dataset of steps with random access minibatches,
+# only the sampled steps are read from disk
+class ShardDataset:
+    def __init__(self, directory):
+        self.shards = [Shard(shard_dir) for shard_dir in list_shards(directory)]
+        self.shards = [shard for shard in self.shards if shard.num_steps > 0]
+        self.shard_offsets = np.cumsum([0] + [shard.num_steps for shard in self.shards])
+        self.num_steps = int(self.shard_offsets[-1])
+        self.num_episodes = sum(shard.num_episodes for shard in self.shards)
+
+    def __len__(self):
+        return self.num_steps
+
+    # the steps with the given global indices as tensors, in the format of RolloutBuffer.tensors
+    # with the additional discounted 'return' of each step
+    def get_batch(self, indices, device=None):
+        indices = np.asarray(indices)
+        shard_ids = np.searchsorted(self.shard_offsets, indices, side='right') - 1
+        fields = self.shards[0].meta['fields']
+        batch = {name: np.zeros((len(indices), *field['shape']), dtype=field['dtype']) for name, field in fields.items()}
+        for shard_id in np.unique(shard_ids):
+            in_shard = shard_ids == shard_id
+            shard = self.shards[shard_id]
+            local = indices[in_shard] - self.shard_offsets[shard_id]
+            order = np.argsort(local) # sequential reads
+            for name, array in shard.arrays.items():
+                values = np.empty_like(batch[name][in_shard])
+                values[order] = array[local[order]]
+                batch[name][in_shard] = values
+
+        num_actions = self.shards[0].num_actions
+        batch['valid_action_mask'] = np.unpackbits(batch['valid_action_mask'], axis=1, count=num_actions).astype(bool)
+        tensors = {name: torch.from_numpy(array) for name, array in batch.items()}
+        if device is not None:
+            tensors = {name: tensor.to(device) for name, tensor in tensors.items()}
+        tensors['node_features'] = tensors['node_features'].float()
+        return tensors
+
+    # one pass over the dataset in random order
+    def minibatches(self, batch_size, device=None, rng=None):
+        rng = rng or np.random.default_rng()
+        permutation = rng.permutation(self.num_steps)
+        for start in range(0, self.num_steps, batch_size):
+            yield self.get_batch(permutation[start:start + batch_size], device)
@@ -1,18 +1,21 @@
-import random
-import networkx as nx
+import copy
+import itertools
 from risk.country import *
-from risk.army import Army
-from risk.player import Player
-from risk.player_rl import PlayerRL
-from risk.game_map import GameMap
+from risk.game_state import GameState, GameSnapshot
+from risk.player import Player, answer_decisions
 from risk.card import *
+from risk.dice import RandomStream, sample_exchange, get_battle_outcome_table
+from risk.battle_odds import conquest_probability
+from risk.topology import get_topology
+from risk.state_encoder import StateEncoder
+from risk.game_record import GameRecord, ReplayPlayer
+from risk.game_stats import GameStats
+import risk.game_record as game_record
+from collections import deque
 import logging
-import matplotlib.colors as mcolors
 import numpy as np
-import bisect
 import math
-
-COLOR_PALETTE = list(mcolors.TABLEAU_COLORS.values()) + list(mcolors.CSS4_COLORS.values())
+import time
 
 class GamePlayState(Enum):
     CARDS = 0
@@ -20,29 +23,60 @@ class GamePlayState(Enum):
     ATTACK = 2
     FORTIFY = 3
 
-# this ensures that each player has the same color on the map plot
-# throughout the game
-def assign_unique_colors(players: List[Player]) -> dict:
-    color_mapping = {}
-    for i, player in enumerate(players):
-        color_mapping[player] = COLOR_PALETTE[i % len(COLOR_PALETTE)]
-    return color_mapping
+# the phase of the recorded decisions, see Game.apply_action
+ACTION_PHASES = {
+    game_record.TRADE_IN: GamePlayState.CARDS,
+    game_record.DRAFT: GamePlayState.DRAFT,
+    game_record.ATTACK: GamePlayState.ATTACK,
+    game_record.BLITZ: GamePlayState.ATTACK,
+    game_record.FORTIFY: GamePlayState.FORTIFY,
+}
 
 class Game:
-    def __init__(self, players, display_map=True, log_all=True, eval_log=False, max_rounds=75):
+    # seed: int or np.random.SeedSequence (e.g. spawned per game, see VecGame) seeding the random
+    # events of the game (initial assignment, deck, dice) and the moves of random players
+    # record: keep a GameRecord of the game in self.record, see Game.replay
+    # max_fps: frame rate limit of the map with display_map, None to draw every change
+    # stop_without_rl: end the game as lost once no RL player is left, set it to False to play
+    # games without RL players to the end (e.g. risk.bench)
+    # stats: collect timings and counters of the game in self.stats, see GameStats
+    def __init__(self, players, display_map=True, log_all=True, eval_log=False, max_rounds=75, seed=None, record=False, max_fps=10, stop_without_rl=True, stats=False):
         self.num_rounds_played = 0
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.random_stream = RandomStream(self.rng) # dice and other single draws, generated in bulk
+        self.record = None
+        self.scripted_outcomes = deque() # recorded outcomes of random events, used instead of the rng when replaying
         self.display_map = display_map
         self.log_all = log_all
         self.eval_log = eval_log
         self.max_rounds = max_rounds # using same max_rounds to compare with old reward scheme
+        self.stop_without_rl = stop_without_rl
+        self.stats = GameStats(num_games=1) if stats else None
         self.players = players
-        for player in players:
+        self.player_by_id = list(players) # pid -> player, unaffected by eliminations
+        for pid, player in enumerate(players):
             player.game = self
+            player.pid = pid
         
         self.players_eliminated = []
+
+        # every game owns its territory state, the countries are views bound to this game
+        self.state = GameState(len(COUNTRIES), len(players))
+        self.countries = [country.bind(self) for country in sorted(COUNTRIES)]
+        self.num_countries = len(self.countries)
             
-        player_colors = assign_unique_colors(self.players)
-        self.game_map = GameMap(display_map=display_map, player_colors=player_colors)
+        self.renderer = None
+        if display_map:
+            # matplotlib and networkx are only imported when the map is drawn
+            from risk.map_renderer import MapRenderer, player_colors
+            from risk.game_map import GameMap
+            self.renderer = MapRenderer(
+                GameMap(),
+                [player.name for player in self.player_by_id],
+                player_colors(len(players)),
+                max_fps=max_fps
+            )
         
         self.num_players = len(self.players)
         self.num_players_start = self.num_players
@@ -50,41 +84,151 @@ class Game:
         if self.log_all:
             logging.info(f"\nStarted new game with {self.num_players_start} players\n")
         
-        self.used_cards = []
         self.country_conquered_in_round = False
         self.current_phase = GamePlayState(0)
         self.current_player = players[0]
         self.assign_countries_and_initialize_armies()
-        self.card_deck = init_deck()
+        self.state.deck[:] = [CARD_TYPE_IDX[card.card_type] for card in init_deck(self.rng)]
+        self.state.deck_size[0] = DECK_SIZE
+        if record:
+            self.record = GameRecord.start(self)
         if self.display_map:
             self.visualize()
         
-        # setup for game state encoding
-        self.countries = sorted(COUNTRIES.copy())
-        self.num_countries = len(self.countries)
-        self.country_idx_map = {c:i for i,c in enumerate(self.countries)}
-        self.edge_list = [(self.country_idx_map[u], self.country_idx_map[v]) for u, v in self.game_map.edges()]
-        self.edge_list.sort(key = lambda x: (x[0], x[1]))
-        src = [x[0] for x in self.edge_list]
-        dst = [x[1] for x in self.edge_list]
-        self.edge_list_array = np.array([src, dst])
-        self.edge_list_idx_map = {x: i for i, x in enumerate(self.edge_list)}
-        self.n_edges = len(self.edge_list)
-
-        # setup for attack option encoding/decoding
-        self.border_map = {c: list(self.game_map.neighbors(c)) for c in self.countries}
-        offset = 0
-        self.attack_options_offset_vals = []
-        self.attack_options_offset_map = {}
-        for k, v in self.border_map.items():
-            self.attack_options_offset_map[k] = offset
-            self.attack_options_offset_vals.append(offset)
-            offset += 3*len(v)
-         
-        self.total_attack_options_cnt = offset + 1 # add skip action
-        self.attack_options_offset_map_rev = {v: k for k, v in self.attack_options_offset_map.items()}
-        self.action_lookup_table = self.get_attack_action_lookup()
+        # static map tables for the engine and for game state encoding, shared by all games
+        self.topology = get_topology()
+        self.edge_list = self.topology.edge_list
+        self.edge_list_array = self.topology.edge_index
+        self.n_edges = self.topology.n_edges
+        self.total_attack_options_cnt = self.topology.total_attack_options_cnt
+        self.action_lookup_table = self.topology.action_lookup_table
+        self.connectivity_cache = {} # pid -> (owner mask, component per country, components)
+        self.state_encoders = {} # pid -> StateEncoder
     
+    # copy of the game sharing the static map and encoding tables with this game,
+    # the players are copied as well so that the two games can be played independently
+    def clone(self):
+        game = copy.copy(self)
+        game.state = self.state.copy()
+        game.connectivity_cache = {}
+        game.state_encoders = {}
+        game.rng = copy.deepcopy(self.rng)
+        game.random_stream = self.random_stream.copy(game.rng)
+        game.scripted_outcomes = deque(self.scripted_outcomes)
+        game.stats = None # simulations in clones are not counted as moves of the game
+        game.display_map = False # nor drawn on the map of the game
+        game.renderer = None
+        if self.record is not None:
+            game.record = self.record.copy()
+        game.countries = [country.bind(game) for country in self.countries]
+        game.player_by_id = [player.copy_for(game) for player in self.player_by_id]
+        game.players = [game.player_by_id[p.pid] for p in self.players]
+        game.players_eliminated = [game.player_by_id[p.pid] for p in self.players_eliminated]
+        game.current_player = game.player_by_id[self.current_player.pid]
+        return game
+
+    # the position (territories, cards, deck, current phase and player, round counter)
+    # without the players internal state, e.g. collected RL experiences
+    def snapshot(self) -> GameSnapshot:
+        return GameSnapshot(
+            self.state.buffer.copy(),
+            self.num_rounds_played,
+            self.current_phase.value,
+            self.current_player.pid,
+            self.country_conquered_in_round,
+            tuple(p.pid for p in self.players),
+            tuple(p.pid for p in self.players_eliminated),
+            None if self.record is None else self.record.mark()
+        )
+
+    def restore(self, snapshot: GameSnapshot):
+        self.state.buffer[:] = snapshot.buffer
+        self.state.update_owner_masks()
+        self.num_rounds_played = snapshot.num_rounds_played
+        self.current_phase = GamePlayState(snapshot.current_phase)
+        self.current_player = self.player_by_id[snapshot.current_player]
+        self.country_conquered_in_round = snapshot.country_conquered_in_round
+        self.players = [self.player_by_id[pid] for pid in snapshot.players]
+        self.players_eliminated = [self.player_by_id[pid] for pid in snapshot.players_eliminated]
+        self.num_players = len(self.players)
+        # the record continues from the restored position
+        if self.record is not None and snapshot.record_size is not None:
+            self.record.truncate(snapshot.record_size)
+
+    # the game after the first num_actions actions of the record (all by default), the
+    # players are ReplayPlayers with the recorded names. the recorded outcomes of random
+    # events are used instead of new random numbers, so no rng state is needed to replay
+    @classmethod
+    def replay(cls, record: GameRecord, num_actions: int = None, **game_kwargs):
+        stop = None if num_actions is None else num_actions + 1
+        for game in itertools.islice(cls.replay_steps(record, **game_kwargs), stop):
+            pass
+        return game
+
+    # replays the record action by action, yielding the game at the initial position
+    # and after every action (the same game object, updated in place)
+    @classmethod
+    def replay_steps(cls, record: GameRecord, **game_kwargs):
+        game_kwargs = {'display_map': False, 'log_all': False, **game_kwargs}
+        players = [ReplayPlayer(name) for name in record.player_names]
+        game = cls(players, max_rounds=record.max_rounds, seed=record.seed, **game_kwargs)
+        state = game.state
+        state.owners[:] = record.owners
+        state.troops[:] = record.troops
+        state.update_owner_masks()
+        state.deck[:len(record.deck)] = record.deck
+        state.deck_size[0] = len(record.deck)
+        if game.display_map:
+            game.visualize()
+        yield game
+
+        for opcode, payload, outcomes in record.actions():
+            game.scripted_outcomes.extend(outcomes)
+            game.apply_action(opcode, payload)
+            assert not game.scripted_outcomes, "the recorded outcomes do not match the replayed action"
+            yield game
+
+    # applies a recorded action, the phases in between are passed first: a decision is made in
+    # its phase of the current turn, and at the end of a turn the player gets the reinforcements
+    # for the next one (like Player.process_fortify_phase)
+    def apply_action(self, opcode: int, payload):
+        phase = ACTION_PHASES.get(opcode, GamePlayState.FORTIFY)
+        assert self.current_phase.value <= phase.value, "the recorded action does not match the phase"
+        while self.current_phase != phase:
+            self.next_phase()
+
+        player = self.current_player
+        countries = self.countries
+        match opcode:
+            case game_record.DRAFT:
+                country, n_soldiers = payload
+                self.assign_soldiers(player, countries[country], n_soldiers)
+            case game_record.ATTACK:
+                attacker_country, defender_country, n_dice = payload
+                self.attack(player, countries[attacker_country], countries[defender_country], n_dice)
+            case game_record.BLITZ:
+                attacker_country, defender_country, min_remaining = payload
+                self.blitz(player, countries[attacker_country], countries[defender_country], min_remaining)
+            case game_record.FORTIFY:
+                origin_country, dest_country, n_soldiers = payload
+                self.fortify(player, countries[origin_country], countries[dest_country], n_soldiers)
+            case game_record.TRADE_IN:
+                self.trade_in_cards(player, [Card(CARD_TYPES[card_type]) for card_type in payload])
+            case game_record.END_TURN:
+                self.reinforce(player)
+                self.next_phase()
+
+    # result of a random event recorded in the game record when replaying, else None
+    def next_scripted_outcome(self, opcode: int):
+        if not self.scripted_outcomes:
+            return None
+        outcome_opcode, payload = self.scripted_outcomes.popleft()
+        assert outcome_opcode == opcode, "the recorded outcomes do not match the replayed action"
+        return payload
+
+    def neighbors(self, country: Country) -> List[Country]:
+        return [self.countries[idx] for idx in self.topology.neighbor_lists[country.idx]]
+
     # node features for GNN
     def get_game_state_encoded(self, player: Player):
         # node features (per territory):
@@ -103,113 +247,46 @@ class Game:
         # 12: if territory conquered, then continent secured 
         # 13: game round number, standardized
 
-        node_features = np.zeros((self.num_countries, 14))
-        neighbors = set()
-        for c in player.countries:
-            neighbors.update(self.game_map.neighbors(c))
-        
-        for country_idx, country in enumerate(self.countries):
-            country_n_soldiers = country.army.n_soldiers
-            country_owner = country.army.owner
-            own_country = country.owner == player
-            if own_country:
-                node_features[country_idx, 0] = 1
-                node_features[country_idx, 1] = country_n_soldiers
-            else:
-                node_features[country_idx, 2] = country_n_soldiers
-            
-            can_attack = int(not own_country and country in neighbors)
-            node_features[country_idx, 12] = can_attack
-
-            if can_attack:
-                # check if conquering country will secure continent
-                continent = country.continent
-                remaining_enemy_countries = [
-                        c for c in continent.countries if c.owner != player and c != country
-                    ]
-                if len(remaining_enemy_countries) == 0:
-                    continent_owners = set([c.owner.name for c in continent.countries])
-                    assert len(continent_owners) == 2
-                    node_features[country_idx, 13] = 1
-
-            soldier_diffs = [country_n_soldiers - c.army.n_soldiers 
-                for c in self.game_map.neighbors(country)
-                    if c not in country_owner.countries
-                    ]
-            
-            if soldier_diffs:
-                n_borders = len(soldier_diffs)
-                avg_diff = np.mean(soldier_diffs)
-                min_diff = min(soldier_diffs)
-                max_diff = max(soldier_diffs)
-                if own_country:
-                    node_features[country_idx, 3:7] = [n_borders, avg_diff, min_diff, max_diff]
-                else:
-                    node_features[country_idx, 7:11] = [n_borders, avg_diff, min_diff, max_diff]
-        
-        # standardize features
-        for idx in [1, 2, 4, 5, 6, 8, 9, 10]:
-            max_val = node_features[:, idx].max()
-            if max_val != 0:
-                node_features[:, idx] = node_features[:, idx] / max_val
-            else:
-                node_features[:, idx] = 0
-        
-        node_features[:, 12] = (self.num_rounds_played + 1) / self.max_rounds
+        # note: the flags of 11 and 12 go to columns 12 and 13, and column 12 is overwritten
+        # with the round number, trained models depend on this layout.
+        # the features are computed incrementally, see StateEncoder
+        if player.pid not in self.state_encoders:
+            self.state_encoders[player.pid] = StateEncoder(self, player)
+        if self.stats is None:
+            return self.state_encoders[player.pid].encode()
+
+        start = time.perf_counter()
+        node_features = self.state_encoders[player.pid].encode()
+        self.stats.add_time('encode', time.perf_counter() - start)
+        self.stats.count('encoder_calls')
         return node_features
                     
                                    
     def get_attack_options_encoded(self, player: Player):
-        attack_options_array = np.zeros(self.total_attack_options_cnt)
-        for country in player.countries:
-            n_soldiers = country.army.n_soldiers
-            if n_soldiers <= 1:
-                continue
-            
-            country_offset = self.attack_options_offset_map[country]
-            border_countries = self.border_map[country]
-            for border_idx, border_country in enumerate(border_countries):
-                if border_country not in player.countries:
-                    max_attack_soldiers = min(3, n_soldiers - 1)
-                    for num_attack_soldiers in range(1, max_attack_soldiers + 1):
-                        idx = country_offset + 3 * border_idx + (num_attack_soldiers - 1)
-                        attack_options_array[idx] = 1
-    
-        attack_options_array[-1] = 1  # skip option
-    
-        return attack_options_array
+        return self.topology.action_table.valid_action_mask(self.state.owners, self.state.troops, player.pid)
 
 
     def decode_attack_option(self, attack_option_idx):
         if attack_option_idx == self.total_attack_options_cnt - 1:
             return (-1, -1, 0)
 
-        pos = bisect.bisect_right(self.attack_options_offset_vals, attack_option_idx)
-        country_offset = self.attack_options_offset_vals[pos - 1]
-        diff = attack_option_idx - country_offset
-        bordering_country_idx = diff // 3
-        n_soldiers = (diff % 3) + 1
-
-        attack_country = self.attack_options_offset_map_rev[country_offset]
-        defend_country = self.border_map[attack_country][bordering_country_idx]
-
-        return attack_country, defend_country, n_soldiers
+        attack_idx, defend_idx, n_soldiers = self.action_lookup_table[attack_option_idx]
+        return self.countries[attack_idx], self.countries[defend_idx], n_soldiers
 
     def get_attack_action_lookup(self):
-        lookup_table = []
-        for i in range(self.total_attack_options_cnt):
-            attack_country, defend_country, n_soldiers = self.decode_attack_option(i)
-            lookup_table.append((
-                -1 if attack_country == -1 else self.countries.index(attack_country), 
-                -1 if defend_country == -1 else self.countries.index(defend_country),
-                n_soldiers
-            ))
-        
-        return lookup_table
+        return self.topology.action_lookup_table
     
     def gameplay_loop(self):
+        result = answer_decisions(self.gameplay_steps())
+        if self.display_map:
+            self.renderer.flush() # the final position, if its frame was throttled
+        return result
+
+    # the game loop as a generator, yielding the decisions that players make through
+    # Player.attack_phase_steps for the caller to answer, returns the game result
+    def gameplay_steps(self):
         while True:
-            if not any([isinstance(p, PlayerRL) for p in self.players]):
+            if self.stop_without_rl and not any([p.is_rl for p in self.players]):
                 if self.eval_log or self.log_all:
                     logging.info(f"\x1b[1m\x1b[31mGame Lost, all RL players eliminated after {self.num_rounds_played} Rounds\x1b[0m")
 
@@ -226,22 +303,29 @@ class Game:
                 if self.log_all or self.eval_log:
                     logging.info(f"\x1b[1m\x1b[32mGame won by player: {self.current_player} after {self.num_rounds_played} rounds\x1b[0m")
                 
-                rl_won = int(isinstance(self.players[0], PlayerRL))
+                rl_won = int(self.players[0].is_rl)
                 return self.num_rounds_played, rl_won, 0
 
-            match self.current_phase:
-                case GamePlayState.CARDS:
-                    self.current_player.process_cards_phase()
-                case GamePlayState.DRAFT:
-                    self.current_player.process_draft_phase()
-                case GamePlayState.ATTACK:
-                    self.current_player.process_attack_phase()
-                case GamePlayState.FORTIFY:
-                    self.current_player.process_fortify_phase() 
+            if self.stats is None:
+                yield from self.phase_steps()
+            else:
+                yield from self.stats.timed_steps(self.phase_steps(), self.current_phase.name, type(self.current_player).__name__)
             self.next_phase()
+
+    # the current phase of the current player
+    def phase_steps(self):
+        match self.current_phase:
+            case GamePlayState.CARDS:
+                self.current_player.process_cards_phase()
+            case GamePlayState.DRAFT:
+                self.current_player.process_draft_phase()
+            case GamePlayState.ATTACK:
+                yield from self.current_player.attack_phase_steps()
+            case GamePlayState.FORTIFY:
+                self.current_player.process_fortify_phase()
     
     def visualize(self):
-        self.game_map.draw_map()
+        self.renderer.draw(self.state.owners, self.state.troops)
 
     def next_player(self):
         next_player_idx = (self.players.index(self.current_player) + 1) % self.num_players
@@ -252,118 +336,130 @@ class Game:
 
     def next_phase(self):
         if self.current_phase.value == len(GamePlayState) - 1:
+            if self.record is not None:
+                self.record.add(game_record.END_TURN)
             self.next_player()
         self.current_phase = GamePlayState((self.current_phase.value + 1) % len(GamePlayState))
 
     def assign_countries_and_initialize_armies(self):
         initial_armies_per_player_dict = {2: 40, 3: 35, 4: 30, 5: 25, 6: 20}
-        countries = COUNTRIES
-        random.shuffle(countries)
+        country_order = self.rng.permutation(self.num_countries)
         num_players = self.num_players
         initial_armies_per_player = initial_armies_per_player_dict[num_players]
 
-        for i, country in enumerate(countries):
-            player = self.players[i % num_players]
-            country.owner = player
-            player.add_country(country)
-            country.army = Army(player, 1)
-
-        for player in self.players:
-            territories_owned = player.countries
+        for pid in range(num_players):
+            territories_owned = country_order[pid::num_players]
             num_territories = len(territories_owned)
-            armies_to_assign = initial_armies_per_player - num_territories
+            self.state.owners[territories_owned] = pid
+            self.state.troops[territories_owned] = 1
 
-            armies_distribution = [0] * num_territories
-            for _ in range(armies_to_assign):
-                idx = random.randint(0, num_territories - 1)
-                armies_distribution[idx] += 1
-
-            for idx, country in enumerate(territories_owned):
-                country.army.n_soldiers += armies_distribution[idx]
+            armies_to_assign = initial_armies_per_player - num_territories
+            idx = self.rng.integers(0, num_territories, size=armies_to_assign)
+            np.add.at(self.state.troops, territories_owned[idx], 1)
+        self.state.update_owner_masks()
 
     def reinforce(self, player: Player):
-        reinforcements = max(len(player.countries) // 3, 3)
+        reinforcements = max(self.state.num_countries_owned(player.pid) // 3, 3)
 
-        for continent in CONTINENTS:
-            if all([country.army and country.army.owner == player for country in continent.countries]):
-                reinforcements += continent.extra_points
+        for continent in self.get_player_continents(player):
+            reinforcements += continent.extra_points
 
-        player.unassigned_soldiers += reinforcements
+        self.state.unassigned[player.pid] += reinforcements
         if self.log_all:
             logging.info(f"\x1b[36m{player}\x1b[0m receives \x1b[33m{reinforcements}\x1b[0m reinforcements\n")
+        return reinforcements
 
     def get_player_army_summary(self, player):
-        summary = [
-            (
+        owners = self.state.owners.tolist()
+        troops = self.state.troops.tolist()
+        summary = []
+        for c in player.countries:
+            enemy_neighbors = [(n, troops[n.idx]) for n in self.neighbors(c) if owners[n.idx] != player.pid]
+            summary.append((
                 c,
-                c.army.n_soldiers,
-                [(n, n.army.n_soldiers) for n in self.game_map.neighbors(c) if n not in player.countries],
-                sum(n.army.n_soldiers for n in self.game_map.neighbors(c) if n not in player.countries) / c.army.n_soldiers # border threat ratio
-            )
-            for c in player.countries
-        ]
+                troops[c.idx],
+                enemy_neighbors,
+                sum(n_soldiers for _, n_soldiers in enemy_neighbors) / troops[c.idx] # border threat ratio
+            ))
         summary.sort(key=lambda x: x[3], reverse=True)
         return [(c[0], c[1], c[2]) for c in summary]
 
     
     def assign_soldiers(self, player: Player, country: Country, n_soldiers: int):
         assert self.current_player == player
-        assert n_soldiers <= player.unassigned_soldiers
-        assert country in player.countries
+        assert n_soldiers <= self.state.unassigned[player.pid]
+        assert self.state.owners[country.idx] == player.pid
 
+        if self.record is not None:
+            self.record.add_draft(country.idx, n_soldiers)
+        if self.stats is not None:
+            self.stats.count('decisions')
         if self.log_all:
             logging.info(f"\x1b[36m{player}\x1b[0m assigns \x1b[33m{n_soldiers}\x1b[0m soldiers to \x1b[35m{country}\x1b[0m")
         
-        country_idx = player.countries.index(country)
-        player.countries[country_idx].army.n_soldiers += n_soldiers
-        player.unassigned_soldiers -= n_soldiers
+        self.state.troops[country.idx] += n_soldiers
+        self.state.unassigned[player.pid] -= n_soldiers
         if self.display_map:
             self.visualize()
 
     def get_soldier_diffs(self, player):
+        owners = self.state.owners.tolist()
+        troops = self.state.troops.tolist()
         diffs = []
         for country in player.countries:
-            n_soldiers = country.army.n_soldiers
-            for neighbor in self.game_map.neighbors(country):
-                if neighbor not in player.countries:
-                    diffs.append(n_soldiers - neighbor.army.n_soldiers)
+            n_soldiers = troops[country.idx]
+            for neighbor_idx in self.topology.neighbor_lists[country.idx]:
+                if owners[neighbor_idx] != player.pid:
+                    diffs.append(n_soldiers - troops[neighbor_idx])
         
         return diffs
 
     def get_attack_options(self, player):
+        owners = self.state.owners.tolist()
+        troops = self.state.troops.tolist()
+        pid = player.pid
+        own_mask = self.state.owner_masks[pid]
+        continent_mask_of = self.topology.continent_mask_of
         options = []
         for country in player.countries:
-            if country.army.n_soldiers == 1:
+            n_soldiers = troops[country.idx]
+            if n_soldiers == 1:
                 continue
-            for neighbor in self.game_map.neighbors(country):
-                if neighbor not in player.countries:
-                    continent = neighbor.continent
-                    remaining_enemy_countries = [
-                        c for c in continent.countries if c.owner != player and c != neighbor
-                    ]
-                    troop_difference = country.army.n_soldiers - neighbor.army.n_soldiers
-
-                    # can secure an continent with an attack where there is a troop advantage
-                    will_secure_continent = len(remaining_enemy_countries) == 0 and troop_difference > 0
+            for neighbor in self.neighbors(country):
+                if owners[neighbor.idx] != pid:
+                    # the neighbor is the last enemy country left in the continent
+                    is_last_enemy_country = (continent_mask_of[neighbor.idx] & ~own_mask) == 1 << neighbor.idx
+                    troop_difference = n_soldiers - troops[neighbor.idx]
+                    win_probability = conquest_probability(n_soldiers - 1, troops[neighbor.idx])
+
+                    # can secure an continent with an attack that is likely to succeed
+                    will_secure_continent = is_last_enemy_country and win_probability > 0.5
                     options.append(
-                        ((country, country.army.n_soldiers), (neighbor, neighbor.army.n_soldiers), will_secure_continent, troop_difference)
+                        ((country, n_soldiers), (neighbor, troops[neighbor.idx]), will_secure_continent, win_probability, troop_difference)
                     )
         
-        options.sort(key=lambda x: (x[2], x[3]), reverse=True) # prioritize oppotunity to secure continent first
-        return [((from_country, from_soldiers), (to_country, to_soldiers)) for ((from_country, from_soldiers), (to_country, to_soldiers), _, _) in options]
+        # prioritize oppotunity to secure continent first, then the odds of conquering the country
+        options.sort(key=lambda x: (x[2], x[3], x[4]), reverse=True)
+        return [(from_option, to_option) for (from_option, to_option, *_) in options]
 
     def attack(self, attacker: Player, attacker_country: Country, defender_country: Country, attacking_soldiers:int):
         assert self.current_player == attacker
 
-        assert attacker_country in attacker.countries
-        assert defender_country not in attacker.countries
+        assert self.state.owners[attacker_country.idx] == attacker.pid
+        assert self.state.owners[defender_country.idx] != attacker.pid
 
         assert 1 <= attacking_soldiers <= 3
         assert 1 <= attacking_soldiers <= min(3, attacker_country.army.n_soldiers - 1)
 
-        assert self.game_map.has_edge(attacker_country, defender_country)
+        assert self.topology.adjacency[attacker_country.idx, defender_country.idx]
+        if self.record is not None:
+            self.record.add(game_record.ATTACK, attacker_country.idx, defender_country.idx, attacking_soldiers)
+        if self.stats is not None:
+            self.stats.count('decisions')
         attack_successful, reward = self.battle(attacker_country, defender_country, attacking_soldiers)
+        return self.finish_attack(attacker, attack_successful, reward)
 
+    def finish_attack(self, attacker: Player, attack_successful: bool, reward: float):
         if attack_successful and not self.country_conquered_in_round:
             self.draw_card(attacker)
             self.country_conquered_in_round = True
@@ -371,16 +467,12 @@ class Game:
         if self.display_map:
             self.visualize()
 
-        if isinstance(attacker, PlayerRL) and self.log_all:
+        if attacker.is_rl and self.log_all:
             logging.info(f"Reward for this attack: {reward}")
         
         game_won = self.num_players == 1
         return reward, game_won
 
-    @staticmethod
-    def roll_dice(n):
-        return sorted([random.randint(1, 6) for _ in range(n)], reverse=True)
-    
     # win territory reward decays exponentially with number of rounds played
     def reward_win_territory(self, start_reward=30, lambda_=0.1):
         t = self.num_rounds_played
@@ -396,28 +488,29 @@ class Game:
         if self.log_all:
             logging.info(f"\n\x1b[34mBattle: \x1b[31m{attacker_country}\x1b[34m -> \x1b[32m{defender_country}\x1b[34m, attacking soldiers\x1b[0m: {attacking_soldiers}")
 
-        prev_player_continents = self.get_player_continents(attacker_country.owner)
-        
-        attacker = attacker_country.army
-        defender = defender_country.army
-
-        attack_rolls = self.roll_dice(attacking_soldiers)
-        defend_rolls = self.roll_dice(min(2, defender.n_soldiers))
-
+        troops = self.state.troops
+        attacker_idx = attacker_country.idx
+        defender_idx = defender_country.idx
+        defending_soldiers = min(2, int(troops[defender_idx]))
+        if self.stats is not None:
+            self.stats.count('battles')
+
+        scripted_outcome = self.next_scripted_outcome(game_record.EXCHANGE)
+        if scripted_outcome is not None:
+            attacker_loss, defender_loss = scripted_outcome
+        else:
+            # same distribution as rolling the dice, in a single table lookup. the exchange is
+            # sampled the same way with and without log_all, so a seed plays the same game
+            attacker_loss, defender_loss = sample_exchange(attacking_soldiers, defending_soldiers, self.random_stream)
+        if self.record is not None:
+            self.record.add(game_record.EXCHANGE, attacker_loss, defender_loss)
         if self.log_all:
-            logging.info(f"\x1b[31mAttacker rolls\x1b[0m: {attack_rolls}")
-            logging.info(f"\x1b[32mDefender rolls\x1b[0m: {defend_rolls}")
-
-        attacker_loss = 0
-        defender_loss = 0
-        for a, d in zip(attack_rolls, defend_rolls):
-            if a > d:
-                defender_loss += 1
-            else:
-                attacker_loss += 1
+            # the outcome of the sampled exchange, the single dice are not rolled
+            logging.info(f"\x1b[31mAttacker dice\x1b[0m: {attacking_soldiers}, \x1b[32mdefender dice\x1b[0m: {defending_soldiers}, "
+                         f"attacker wins {defender_loss} of {attacker_loss + defender_loss} dice comparisons")
 
-        attacker.n_soldiers -= attacker_loss
-        defender.n_soldiers -= defender_loss
+        troops[attacker_idx] -= attacker_loss
+        troops[defender_idx] -= defender_loss
 
         reward = -0.5 * attacker_loss
 
@@ -425,91 +518,205 @@ class Game:
             logging.info(f"\x1b[32mDefender loses \x1b[33m{defender_loss}\x1b[0m\x1b[32m soldiers\x1b[0m")
             logging.info(f"\x1b[31mAttacker loses \x1b[33m{attacker_loss}\x1b[0m\x1b[31m soldiers\x1b[0m")
 
-        if defender.n_soldiers <= 0:
-            reward += self.reward_win_territory()
-            if self.log_all:
-                logging.info(f"\x1b[1m\x1b[31m{defender_country} has been conquered!\x1b[0m")
-            defender_country.owner.remove_country(defender_country)
-
-            if len(defender_country.owner.countries) == 0:
-                reward += 5000
-                eliminated_player = defender_country.owner
-                if self.log_all or (self.eval_log and isinstance(eliminated_player, PlayerRL)):
-                    logging.info(f"{eliminated_player} has been eliminated after {self.num_rounds_played} rounds")
-
-                self.players_eliminated.append(eliminated_player)
-                eliminated_player_idx = self.players.index(eliminated_player)
-                self.players.pop(eliminated_player_idx)
-                self.num_players -= 1
-                if self.num_players == 1:
-                    reward += 50_000 # game won
-                    self.players_eliminated.append(self.players[0]) # collect experiences of winner for training
-
-            defender_country.owner = attacker_country.owner
-            attacker_country.owner.add_country(defender_country)
-
-            # Move soldiers into the conquered country
-            soldiers_to_move = attacking_soldiers
-            if attacker.n_soldiers - soldiers_to_move < 1:
-                soldiers_to_move = attacker.n_soldiers - 1
-            attacker.n_soldiers -= soldiers_to_move
-            defender_country.army = Army(attacker.owner, soldiers_to_move)
-
-            if self.get_player_continents(attacker_country.owner) != prev_player_continents:
-                reward += 1000
-            
+        if troops[defender_idx] <= 0:
+            reward += self.conquer(attacker_country, defender_country, attacking_soldiers)
             return True, reward
 
         return False, reward
 
+    # attack until the defender is conquered or only min_remaining soldiers are left in the
+    # attacking country, rolling the maximum number of dice, the whole sequence of
+    # exchanges is sampled in one call from the precomputed tables in risk.dice
+    def blitz(self, attacker: Player, attacker_country: Country, defender_country: Country, min_remaining: int = 1):
+        assert self.current_player == attacker
+
+        assert self.state.owners[attacker_country.idx] == attacker.pid
+        assert self.state.owners[defender_country.idx] != attacker.pid
+
+        assert min_remaining >= 1
+        assert attacker_country.army.n_soldiers > min_remaining
+
+        assert self.topology.adjacency[attacker_country.idx, defender_country.idx]
+        if self.record is not None:
+            self.record.add(game_record.BLITZ, attacker_country.idx, defender_country.idx, min_remaining)
+        if self.stats is not None:
+            self.stats.count('decisions')
+
+        troops = self.state.troops
+        attacker_idx = attacker_country.idx
+        defender_idx = defender_country.idx
+        committed_soldiers = int(troops[attacker_idx]) - min_remaining
+        if self.stats is not None:
+            self.stats.count('blitzes')
+
+        if self.log_all:
+            logging.info(f"\n\x1b[34mBlitz: \x1b[31m{attacker_country}\x1b[34m -> \x1b[32m{defender_country}\x1b[34m, committed soldiers\x1b[0m: {committed_soldiers}")
+
+        scripted_outcome = self.next_scripted_outcome(game_record.BLITZ_RESULT)
+        if scripted_outcome is not None:
+            attackers_left, defenders_left = scripted_outcome
+        else:
+            attackers_left, defenders_left = get_battle_outcome_table().sample(committed_soldiers, int(troops[defender_idx]), self.random_stream)
+        if self.record is not None:
+            self.record.add(game_record.BLITZ_RESULT, attackers_left, defenders_left)
+        attacker_loss = committed_soldiers - attackers_left
+        defender_loss = int(troops[defender_idx]) - defenders_left
+        troops[attacker_idx] -= attacker_loss
+        troops[defender_idx] = defenders_left
+
+        reward = -0.5 * attacker_loss
+
+        if self.log_all:
+            logging.info(f"\x1b[32mDefender loses \x1b[33m{defender_loss}\x1b[0m\x1b[32m soldiers\x1b[0m")
+            logging.info(f"\x1b[31mAttacker loses \x1b[33m{attacker_loss}\x1b[0m\x1b[31m soldiers\x1b[0m")
+
+        attack_successful = defenders_left == 0
+        if attack_successful:
+            # the last exchange rolled at least min(3, attackers_left) dice
+            reward += self.conquer(attacker_country, defender_country, min(3, attackers_left))
+
+        return self.finish_attack(attacker, attack_successful, reward)
+
+    # defender_country has no soldiers left, the attacker takes it over,
+    # returns the reward for the conquest
+    def conquer(self, attacker_country: Country, defender_country: Country, soldiers_to_move: int):
+        owners = self.state.owners
+        troops = self.state.troops
+        attacker_idx = attacker_country.idx
+        defender_idx = defender_country.idx
+        attacking_player = self.player_by_id[owners[attacker_idx]]
+        defending_player = self.player_by_id[owners[defender_idx]]
+
+        reward = self.reward_win_territory()
+        if self.stats is not None:
+            self.stats.count('conquests')
+        if self.log_all:
+            logging.info(f"\x1b[1m\x1b[31m{defender_country} has been conquered!\x1b[0m")
+
+        prev_player_continents = self.get_player_continents(attacking_player)
+        self.state.set_owner(defender_idx, attacking_player.pid)
+
+        if self.state.num_countries_owned(defending_player.pid) == 0:
+            reward += 5000
+            eliminated_player = defending_player
+            if self.log_all or (self.eval_log and eliminated_player.is_rl):
+                logging.info(f"{eliminated_player} has been eliminated after {self.num_rounds_played} rounds")
+
+            self.players_eliminated.append(eliminated_player)
+            eliminated_player_idx = self.players.index(eliminated_player)
+            self.players.pop(eliminated_player_idx)
+            self.num_players -= 1
+            if self.num_players == 1:
+                reward += 50_000 # game won
+                self.players_eliminated.append(self.players[0]) # collect experiences of winner for training
+
+        # Move soldiers into the conquered country
+        if troops[attacker_idx] - soldiers_to_move < 1:
+            soldiers_to_move = troops[attacker_idx] - 1
+        troops[attacker_idx] -= soldiers_to_move
+        troops[defender_idx] = soldiers_to_move
+
+        if self.get_player_continents(attacking_player) != prev_player_continents:
+            reward += 1000
+
+        return reward
+
     def get_player_continents(self, player):
+        own_mask = self.state.owner_masks[player.pid]
         continents = []
-        for continent in CONTINENTS:
-            if all([country.army.owner == player for country in continent.countries]):
+        for continent, continent_mask in zip(CONTINENTS, self.topology.continent_masks):
+            if own_mask & continent_mask == continent_mask:
                 continents.append(continent)
 
         return continents
                 
 
+    # groups of countries of the player that are connected through countries of the player,
+    # found with union-find over the borders. the result only depends on the territories of
+    # the player, so it is cached until they change (compared by ownership mask)
+    def get_player_connectivity(self, pid: int):
+        own_mask = self.state.owner_masks[pid]
+        cached = self.connectivity_cache.get(pid)
+        if cached is not None and cached[0] == own_mask:
+            return cached
+        if self.stats is not None:
+            self.stats.count('connectivity_rebuilds')
+
+        owners = self.state.owners.tolist()
+        parent = list(range(self.num_countries))
+        def find(idx):
+            while parent[idx] != idx:
+                parent[idx] = parent[parent[idx]]
+                idx = parent[idx]
+            return idx
+
+        for u, v in self.edge_list:
+            if owners[u] == pid and owners[v] == pid:
+                root_u, root_v = find(u), find(v)
+                if root_u != root_v:
+                    parent[max(root_u, root_v)] = min(root_u, root_v)
+
+        component_of = [find(idx) if owner == pid else -1 for idx, owner in enumerate(owners)]
+        components = {}
+        for idx, root in enumerate(component_of):
+            if root >= 0:
+                components.setdefault(root, []).append(idx)
+
+        cached = (own_mask, component_of, list(components.values()))
+        self.connectivity_cache[pid] = cached
+        return cached
+
+    # lists of country indices, ordered by their smallest index
+    def get_player_components(self, player: Player):
+        _, _, components = self.get_player_connectivity(player.pid)
+        return components
+
+    # if soldiers can be moved from origin_country to dest_country, i.e. both countries belong to the
+    # same player and are connected through countries of that player (troops are not checked)
+    def can_fortify(self, origin_country: Country, dest_country: Country) -> bool:
+        pid = int(self.state.owners[origin_country.idx])
+        if pid < 0 or origin_country.idx == dest_country.idx:
+            return False
+        _, component_of, _ = self.get_player_connectivity(pid)
+        return component_of[origin_country.idx] == component_of[dest_country.idx]
+
     # for each country that a player owns(player.countries)
     # get all other connected countries that the player owns
     # two countries are connected if there is a path between them
     # and all countries along that path are owned by the player
     def get_fortify_options(self, player: Player):
-        player_subgraph = self.game_map.get_subgraph(player.countries)
+        if self.stats is not None:
+            self.stats.count('fortify_option_calls')
+        owners = self.state.owners.tolist()
+        troops = self.state.troops.tolist()
+        neighbor_lists = self.topology.neighbor_lists
         ranked_options = []
 
-        for component in nx.connected_components(player_subgraph):
-            component_countries = list(component)
+        # the smallest troop difference to an enemy neighbor, inf for interior countries
+        troop_diffs = {}
+        for idx in self.state.player_countries(player.pid).tolist():
+            enemy_troops = [troops[n] for n in neighbor_lists[idx] if owners[n] != player.pid]
+            troop_diffs[idx] = troops[idx] - max(enemy_troops) if enemy_troops else float('inf')
+
+        for component in self.get_player_components(player):
+            component_countries = [self.countries[idx] for idx in component]
             for origin_country in component_countries:
-                if origin_country.army.n_soldiers < 2:
+                if troops[origin_country.idx] < 2:
                     continue
 
-                origin_neighbors = self.game_map.neighbors(origin_country)
-                origin_enemy_neighbors = [n for n in origin_neighbors if n.owner != player]
-                if origin_enemy_neighbors:
-                    origin_troop_diff = min(origin_country.army.n_soldiers - n.army.n_soldiers for n in origin_enemy_neighbors)
-                else:
-                    origin_troop_diff = float('inf')
-                
+                origin_troop_diff = troop_diffs[origin_country.idx]
                 for dest_country in component_countries:
                     if dest_country == origin_country:
                         continue
                     
-                    dest_neighbors = self.game_map.neighbors(dest_country)
-                    dest_enemy_neighbors = [n for n in dest_neighbors if n.owner != player]
-                    if dest_enemy_neighbors:
-                        dest_troop_diff = min(dest_country.army.n_soldiers - n.army.n_soldiers for n in dest_enemy_neighbors)
-                    else:
-                        dest_troop_diff = float('inf')
-                    
+                    dest_troop_diff = troop_diffs[dest_country.idx]
                     ranked_options.append((
                         origin_country,
                         dest_country,
                         origin_troop_diff,
                         dest_troop_diff,
-                        origin_country.army.n_soldiers,
-                        dest_country.army.n_soldiers
+                        troops[origin_country.idx],
+                        troops[dest_country.idx]
                     ))
 
         ranked_options.sort(key=lambda x: (x[3], -x[5], -x[2], -x[4]))
@@ -518,23 +725,24 @@ class Game:
     def fortify(self, player: Player, origin_country: Country, dest_country: Country, n_soldiers_move: int):
         assert self.current_player == player
         
-        assert origin_country in player.countries
-        assert dest_country in player.countries
+        assert self.state.owners[origin_country.idx] == player.pid
+        assert self.state.owners[dest_country.idx] == player.pid
 
-        assert n_soldiers_move <= origin_country.army.n_soldiers
+        assert n_soldiers_move <= self.state.troops[origin_country.idx]
 
-        fortify_options = self.get_fortify_options(player)
-        origin_options = [x[0] for x in fortify_options]
-        dest_options = [x[1] for x in fortify_options]
+        assert self.state.troops[origin_country.idx] >= 2
+        assert self.can_fortify(origin_country, dest_country)
 
-        assert origin_country in origin_options
-        assert dest_country in dest_options
+        if self.record is not None:
+            self.record.add(game_record.FORTIFY, origin_country.idx, dest_country.idx, n_soldiers_move)
+        if self.stats is not None:
+            self.stats.count('decisions')
         
         if self.log_all:
             logging.info(f"\x1b[36m{player}\x1b[0m fortifies \x1b[33m{n_soldiers_move}\x1b[0m from \x1b[35m{origin_country}\x1b[0m to \x1b[35m{dest_country}\x1b[0m")
         
-        dest_country.army.n_soldiers += n_soldiers_move
-        origin_country.army.n_soldiers -= n_soldiers_move
+        self.state.troops[dest_country.idx] += n_soldiers_move
+        self.state.troops[origin_country.idx] -= n_soldiers_move
         
         if self.display_map:
             self.visualize()
@@ -542,29 +750,39 @@ class Game:
     def draw_card(self, player: Player):
         assert self.current_player == player
 
-        if len(self.card_deck) == 0:
-            self.card_deck = self.used_cards
-            self.used_cards = []
-            random.shuffle(self.card_deck)
+        state = self.state
+        if state.deck_size[0] == 0:
+            used_cards = self.next_scripted_outcome(game_record.RESHUFFLE)
+            if used_cards is None:
+                used_cards = [card_type for card_type, n in enumerate(state.used_cards) for _ in range(n)]
+                self.rng.shuffle(used_cards)
+            if self.record is not None:
+                self.record.add_reshuffle(used_cards)
+            state.deck[:len(used_cards)] = used_cards
+            state.deck_size[0] = len(used_cards)
+            state.used_cards[:] = 0
         
-        drawn_card = self.card_deck.pop()
-        player.cards[drawn_card.card_type].append(drawn_card)
+        state.deck_size[0] -= 1
+        drawn_card_type = state.deck[state.deck_size[0]]
+        state.cards[player.pid, drawn_card_type] += 1
 
     def trade_in_cards(self, player: Player, card_combination):
         assert self.current_player == player
         
         trade_in_options = player.get_trade_in_options()
         assert card_combination in trade_in_options
+        if self.record is not None:
+            self.record.add(game_record.TRADE_IN, *[CARD_TYPE_IDX[card.card_type] for card in card_combination])
+        if self.stats is not None:
+            self.stats.count('decisions')
 
-        player.n_card_trade_ins += 1
-        player.unassigned_soldiers += trade_in_rewards(player.n_card_trade_ins)
+        self.state.trade_ins[player.pid] += 1
+        self.state.unassigned[player.pid] += trade_in_rewards(player.n_card_trade_ins)
 
-        cards_played = []
         for card in card_combination:
-            cards_played.append(player.cards[card.card_type].pop())
+            self.state.cards[player.pid, CARD_TYPE_IDX[card.card_type]] -= 1
+            self.state.used_cards[CARD_TYPE_IDX[card.card_type]] += 1
         
         if self.log_all:
             cards_str = ', '.join([str(x) for x in card_combination])
             logging.info(f"\x1b[36m{player}\x1b[0m plays cards: \x1b[33m ({cards_str})\x1b[0m")
-        
-        self.used_cards += cards_played
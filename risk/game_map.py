@@ -1,19 +1,12 @@
 import networkx as nx
-from typing import List
-
-import matplotlib
-matplotlib.use('Agg') # use TkAgg when running locally
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch
-import matplotlib.colors as mcolors
-plt.ion()
 
 import risk.country
 
+# the countries and their borders, with the positions of the countries on the map plot
+# (drawn by risk.map_renderer)
 class GameMap(nx.Graph):
-    def __init__(self, display_map=True, player_colors=None):
+    def __init__(self):
         super().__init__()
-        self.player_colors = player_colors
         self.initialize_game_map()
         self.positions = {
             risk.country.Alaska: (-2, 6),
@@ -59,149 +52,7 @@ class GameMap(nx.Graph):
             risk.country.WesternAustralia: (7, 1),
             risk.country.EasternAustralia: (8, 0.5)
         }
-        if display_map:
-            self.fig, self.ax = plt.subplots(figsize=(18, 10))
-            plt.ion()
-
-    def draw_map(self):
-        self.ax.clear()
-        color_map = []
-        players_present = set()
-
-        for node in self.nodes():
-            if node.army and node.army.owner:
-                players_present.add(node.army.owner)
-
-        players_present = sorted(players_present, key=lambda p: str(p))
-        for node in self.nodes():
-            if node.army and node.army.owner:
-                color_map.append(self.player_colors.get(node.army.owner, 'gray'))
-            else:
-                color_map.append('gray')
-
-        unique_colors = list(set(color_map))
-        cmap = mcolors.ListedColormap(unique_colors)
-
-        nx.draw(
-            self,
-            with_labels=True,
-            node_color=color_map,
-            cmap=cmap,
-            pos=self.positions,
-            node_size=3000,
-            ax=self.ax
-        )
-
-        legend_elements = []
-        for player, color in self.player_colors.items():
-            if player in players_present:
-                legend_elements.append(Patch(facecolor=color, edgecolor='black', label=str(player)))
-
-        self.ax.legend(handles=legend_elements, title="Players", loc='best')
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
 
     def initialize_game_map(self):
-        self.add_edge(risk.country.Alaska, risk.country.NorthwestTerritory)
-        self.add_edge(risk.country.Alaska, risk.country.Alberta)
-        self.add_edge(risk.country.NorthwestTerritory, risk.country.Alberta)
-        self.add_edge(risk.country.NorthwestTerritory, risk.country.Ontario)
-        self.add_edge(risk.country.NorthwestTerritory, risk.country.Greenland)
-        self.add_edge(risk.country.Alberta, risk.country.Ontario)
-        self.add_edge(risk.country.Alberta, risk.country.WesternUS)
-        self.add_edge(risk.country.Ontario, risk.country.Quebec)
-        self.add_edge(risk.country.Ontario, risk.country.EasternUS)
-        self.add_edge(risk.country.Ontario, risk.country.WesternUS)
-        self.add_edge(risk.country.Quebec, risk.country.EasternUS)
-        self.add_edge(risk.country.Quebec, risk.country.Greenland)
-        self.add_edge(risk.country.WesternUS, risk.country.EasternUS)
-        self.add_edge(risk.country.WesternUS, risk.country.CentralAmerica)
-        self.add_edge(risk.country.EasternUS, risk.country.CentralAmerica)
-        self.add_edge(risk.country.Venezuela, risk.country.CentralAmerica)
-        self.add_edge(risk.country.Venezuela, risk.country.Brazil)
-        self.add_edge(risk.country.Venezuela, risk.country.Peru)
-        self.add_edge(risk.country.Brazil, risk.country.Peru)
-        self.add_edge(risk.country.Brazil, risk.country.Argentina)
-        self.add_edge(risk.country.Brazil, risk.country.NorthAfrica)
-        self.add_edge(risk.country.Peru, risk.country.Argentina)
-        self.add_edge(risk.country.Iceland, risk.country.Greenland)
-        self.add_edge(risk.country.Iceland, risk.country.GreatBritain)
-        self.add_edge(risk.country.Iceland, risk.country.Scandinavia)
-        self.add_edge(risk.country.GreatBritain, risk.country.Scandinavia)
-        self.add_edge(risk.country.GreatBritain, risk.country.NorthernEurope)
-        self.add_edge(risk.country.GreatBritain, risk.country.WesternEurope)
-        self.add_edge(risk.country.Scandinavia, risk.country.NorthernEurope)
-        self.add_edge(risk.country.NorthernEurope, risk.country.Ukraine)
-        self.add_edge(risk.country.NorthernEurope, risk.country.SouthernEurope)
-        self.add_edge(risk.country.NorthernEurope, risk.country.WesternEurope)
-        self.add_edge(risk.country.Ukraine, risk.country.Scandinavia)
-        self.add_edge(risk.country.Ukraine, risk.country.SouthernEurope)
-        self.add_edge(risk.country.Ukraine, risk.country.Ural)
-        self.add_edge(risk.country.Ukraine, risk.country.Afghanistan)
-        self.add_edge(risk.country.Ukraine, risk.country.MiddleEast)
-        self.add_edge(risk.country.WesternEurope, risk.country.SouthernEurope)
-        self.add_edge(risk.country.SouthernEurope, risk.country.Egypt)
-        self.add_edge(risk.country.SouthernEurope, risk.country.MiddleEast)
-        self.add_edge(risk.country.NorthAfrica, risk.country.Brazil)
-        self.add_edge(risk.country.NorthAfrica, risk.country.WesternEurope)
-        self.add_edge(risk.country.NorthAfrica, risk.country.Egypt)
-        self.add_edge(risk.country.NorthAfrica, risk.country.EastAfrica)
-        self.add_edge(risk.country.NorthAfrica, risk.country.Congo)
-        self.add_edge(risk.country.Egypt, risk.country.EastAfrica)
-        self.add_edge(risk.country.Egypt, risk.country.MiddleEast)
-        self.add_edge(risk.country.EastAfrica, risk.country.Congo)
-        self.add_edge(risk.country.EastAfrica, risk.country.SouthAfrica)
-        self.add_edge(risk.country.EastAfrica, risk.country.Madagascar)
-        self.add_edge(risk.country.Congo, risk.country.SouthAfrica)
-        self.add_edge(risk.country.SouthAfrica, risk.country.Madagascar)
-        self.add_edge(risk.country.Ural, risk.country.Siberia)
-        self.add_edge(risk.country.Ural, risk.country.China)
-        self.add_edge(risk.country.Ural, risk.country.Afghanistan)
-        self.add_edge(risk.country.Siberia, risk.country.Yakutsk)
-        self.add_edge(risk.country.Siberia, risk.country.Irkutsk)
-        self.add_edge(risk.country.Siberia, risk.country.Mongolia)
-        self.add_edge(risk.country.Siberia, risk.country.China)
-        self.add_edge(risk.country.Yakutsk, risk.country.Irkutsk)
-        self.add_edge(risk.country.Irkutsk, risk.country.Mongolia)
-        self.add_edge(risk.country.Irkutsk, risk.country.Kamchatka)
-        self.add_edge(risk.country.Kamchatka, risk.country.Yakutsk)
-        self.add_edge(risk.country.Kamchatka, risk.country.Japan)
-        self.add_edge(risk.country.Kamchatka, risk.country.Mongolia)
-        self.add_edge(risk.country.Mongolia, risk.country.China)
-        self.add_edge(risk.country.Mongolia, risk.country.Japan)
-        self.add_edge(risk.country.China, risk.country.Mongolia)
-        self.add_edge(risk.country.China, risk.country.India)
-        self.add_edge(risk.country.China, risk.country.Siam)
-        self.add_edge(risk.country.India, risk.country.Siam)
-        self.add_edge(risk.country.India, risk.country.MiddleEast)
-        self.add_edge(risk.country.Afghanistan, risk.country.China)
-        self.add_edge(risk.country.Afghanistan, risk.country.India)
-        self.add_edge(risk.country.Afghanistan, risk.country.MiddleEast)
-        self.add_edge(risk.country.Indonesia, risk.country.Siam)
-        self.add_edge(risk.country.Indonesia, risk.country.NewGuinea)
-        self.add_edge(risk.country.Indonesia, risk.country.WesternAustralia)
-        self.add_edge(risk.country.NewGuinea, risk.country.EasternAustralia)
-        self.add_edge(risk.country.NewGuinea, risk.country.WesternAustralia)
-        self.add_edge(risk.country.EasternAustralia, risk.country.WesternAustralia)
-        self.add_edge(risk.country.Alaska, risk.country.Kamchatka)
-        self.add_edge(risk.country.Greenland, risk.country.Iceland)
-        self.add_edge(risk.country.Brazil, risk.country.NorthAfrica)
-        self.add_edge(risk.country.SouthernEurope, risk.country.Egypt)
-        self.add_edge(risk.country.WesternEurope, risk.country.NorthAfrica)
-        self.add_edge(risk.country.SouthernEurope, risk.country.NorthAfrica)
-        self.add_edge(risk.country.EastAfrica, risk.country.MiddleEast)
-        self.add_edge(risk.country.Ukraine, risk.country.Ural)
-        self.add_edge(risk.country.Ukraine, risk.country.Afghanistan)
-        self.add_edge(risk.country.Ukraine, risk.country.MiddleEast)
-        self.add_edge(risk.country.Siam, risk.country.Indonesia)
-
-    # cannot call .subgraph() on the main class; it causes
-    # an indirect call to the constructor, which generates an additional empty plot
-    def get_subgraph(self, countries: List[risk.country.Country]):
-        subgraph = nx.Graph()
-        subgraph.add_nodes_from(countries)
-        for u, v in self.edges():
-            if u in countries and v in countries:
-                subgraph.add_edge(u, v)
-
-        return subgraph
+        for u, v in risk.country.BORDERS:
+            self.add_edge(risk.country.country_instances[u], risk.country.country_instances[v])
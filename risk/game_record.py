@@ -0,0 +1,178 @@
+import struct
+import zlib
+from typing import List
+import numpy as np
+from risk.player import Player
+
+RECORD_MAGIC = b'RSKR'
+RECORD_VERSION = 2
+NO_SEED = -1
+
+# header: magic, version, number of players, max rounds, seed, number of countries
+HEADER_FORMAT = '<4sBBHqB'
+
+# events are an opcode byte followed by a fixed payload. actions are the decisions of the players
+# and the ends of the turns, outcomes are the results of the random events an action caused, they
+# are recorded after their action, so that replaying an action can consume them in order.
+# what the replay can derive is not recorded: the phase of a decision follows from its type and
+# the reinforcements are computed when a turn ends (see Game.apply_action). the turn ends are
+# needed, a turn can pass without any decision
+DRAFT, ATTACK, BLITZ, FORTIFY, TRADE_IN, END_TURN, EXCHANGE, BLITZ_RESULT, RESHUFFLE = range(9)
+EVENT_FORMATS = {
+    DRAFT: '<BH',         # country, soldiers (consecutive drafts to the same country are merged)
+    ATTACK: '<BBB',       # attacker country, defender country, dice
+    BLITZ: '<BBH',        # attacker country, defender country, soldiers to keep
+    FORTIFY: '<BBH',      # origin country, destination country, soldiers
+    TRADE_IN: '<BBB',     # card types
+    END_TURN: '<',
+    EXCHANGE: '<BB',      # attacker loss, defender loss
+    BLITZ_RESULT: '<HH',  # attackers left, defenders left
+    RESHUFFLE: '<B',      # number of cards, followed by the card types of the new deck
+}
+EVENT_STRUCTS = {opcode: struct.Struct(fmt) for opcode, fmt in EVENT_FORMATS.items()}
+OUTCOME_EVENTS = {EXCHANGE, BLITZ_RESULT, RESHUFFLE}
+
+# compact binary record of a game: the seed and the initial position (territories and deck)
+# followed by the event stream, which is zlib compressed in the serialized form (see to_bytes).
+# see Game(record=True) and Game.replay
+class GameRecord:
+    def __init__(self, player_names: List[str], max_rounds: int, seed, owners, troops, deck):
+        self.player_names = list(player_names)
+        self.max_rounds = max_rounds
+        self.seed = seed # None if the game was not seeded with an int, NO_SEED in the serialized form
+        self.owners = np.array(owners, dtype=np.int8)
+        self.troops = np.array(troops, dtype=np.uint16)
+        self.deck = np.array(deck, dtype=np.uint8)
+        self.events = bytearray()
+        self.draft_offset = None # offset of the last event if it is a draft that can be extended
+
+    @classmethod
+    def start(cls, game) -> 'GameRecord':
+        state = game.state
+        return cls(
+            [player.name for player in game.player_by_id],
+            game.max_rounds,
+            game.seed if isinstance(game.seed, int) else None, # spawned SeedSequences are not recorded
+            state.owners,
+            state.troops,
+            state.deck[:state.deck_size[0]]
+        )
+
+    def copy(self) -> 'GameRecord':
+        record = GameRecord(self.player_names, self.max_rounds, self.seed, self.owners, self.troops, self.deck)
+        record.events = bytearray(self.events)
+        record.draft_offset = self.draft_offset
+        return record
+
+    def add(self, opcode: int, *payload):
+        self.draft_offset = None
+        self.events.append(opcode)
+        self.events += EVENT_STRUCTS[opcode].pack(*payload)
+
+    # drafts of single soldiers to the same country (e.g. PlayerHeuristic) are one event
+    def add_draft(self, country: int, n_soldiers: int):
+        draft_struct = EVENT_STRUCTS[DRAFT]
+        if self.draft_offset is not None:
+            last_country, last_n_soldiers = draft_struct.unpack_from(self.events, self.draft_offset + 1)
+            if last_country == country and last_n_soldiers + n_soldiers <= 0xFFFF:
+                draft_struct.pack_into(self.events, self.draft_offset + 1, country, last_n_soldiers + n_soldiers)
+                return
+        self.add(DRAFT, country, n_soldiers)
+        self.draft_offset = len(self.events) - 1 - draft_struct.size
+
+    # the current size of the events, for truncate. later drafts are not merged into the
+    # events before this point, so that truncating to it restores them as they are now
+    def mark(self) -> int:
+        self.draft_offset = None
+        return len(self.events)
+
+    def add_reshuffle(self, deck):
+        self.add(RESHUFFLE, len(deck))
+        self.events += bytes(deck)
+
+    def truncate(self, num_bytes: int):
+        del self.events[num_bytes:]
+        self.draft_offset = None
+
+    # (opcode, payload) of every event, the payload of RESHUFFLE is the new deck
+    def iter_events(self):
+        events = self.events
+        offset = 0
+        while offset < len(events):
+            opcode = events[offset]
+            event_struct = EVENT_STRUCTS[opcode]
+            payload = event_struct.unpack_from(events, offset + 1)
+            offset += 1 + event_struct.size
+            if opcode == RESHUFFLE:
+                n_cards = payload[0]
+                payload = list(events[offset:offset + n_cards])
+                offset += n_cards
+            yield opcode, payload
+
+    # the events grouped as (opcode, payload, outcomes) per action
+    def actions(self):
+        actions = []
+        for opcode, payload in self.iter_events():
+            if opcode in OUTCOME_EVENTS:
+                actions[-1][2].append((opcode, payload))
+            else:
+                actions.append((opcode, payload, []))
+        return actions
+
+    def to_bytes(self) -> bytes:
+        names = '\0'.join(self.player_names).encode()
+        return b''.join([
+            struct.pack(HEADER_FORMAT, RECORD_MAGIC, RECORD_VERSION, len(self.player_names), self.max_rounds, NO_SEED if self.seed is None else self.seed, len(self.owners)),
+            struct.pack('<H', len(names)), names,
+            self.owners.tobytes(),
+            self.troops.astype('<u2').tobytes(),
+            struct.pack('<B', len(self.deck)), self.deck.tobytes(),
+            zlib.compress(bytes(self.events)),
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'GameRecord':
+        magic, version, num_players, max_rounds, seed, num_countries = struct.unpack_from(HEADER_FORMAT, data)
+        assert magic == RECORD_MAGIC and version == RECORD_VERSION, "not a game record"
+        offset = struct.calcsize(HEADER_FORMAT)
+
+        (names_size,) = struct.unpack_from('<H', data, offset)
+        offset += 2
+        player_names = data[offset:offset + names_size].decode().split('\0')
+        offset += names_size
+        assert len(player_names) == num_players
+
+        owners = np.frombuffer(data, dtype=np.int8, count=num_countries, offset=offset)
+        offset += num_countries
+        troops = np.frombuffer(data, dtype='<u2', count=num_countries, offset=offset)
+        offset += 2 * num_countries
+        deck_size = data[offset]
+        deck = np.frombuffer(data, dtype=np.uint8, count=deck_size, offset=offset + 1)
+        offset += 1 + deck_size
+
+        record = cls(player_names, max_rounds, None if seed == NO_SEED else seed, owners, troops, deck)
+        record.events = bytearray(zlib.decompress(data[offset:]))
+        return record
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path) -> 'GameRecord':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+# stand in for the players of a replayed game, their moves come from the record
+class ReplayPlayer(Player):
+    def process_cards_phase(self):
+        raise NotImplementedError("replayed players do not make decisions")
+
+    def process_draft_phase(self):
+        raise NotImplementedError("replayed players do not make decisions")
+
+    def process_attack_phase(self):
+        raise NotImplementedError("replayed players do not make decisions")
+
+    def process_fortify_phase(self):
+        raise NotImplementedError("replayed players do not make decisions")
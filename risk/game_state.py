@@ -0,0 +1,81 @@
+from typing import NamedTuple, Optional, Tuple
+import copy
+import math
+import numpy as np
+from risk.card import CardType, DECK_SIZE
+
+N_CARD_TYPES = len(CardType)
+
+class GameState:
+    # struct-of-arrays game position, indexed by territory index (see Country.idx)
+    # and player id (see Player.pid). every field is a view into one flat buffer,
+    # so copying a whole position is a single memcpy
+    def __init__(self, num_countries: int, num_players: int):
+        self.num_countries = num_countries
+        self.num_players = num_players
+        self.country_bits = 2.0 ** np.arange(num_countries)
+
+        self.layout = [
+            ('owners', (num_countries,)),          # player id per territory, -1 if unowned
+            ('troops', (num_countries,)),          # soldiers per territory
+            ('cards', (num_players, N_CARD_TYPES)), # card counts per player and CardType
+            ('unassigned', (num_players,)),        # soldiers waiting to be drafted
+            ('trade_ins', (num_players,)),         # number of card trade ins so far
+            ('deck', (DECK_SIZE,)),                # CardType index of the cards in the deck, top card last
+            ('deck_size', (1,)),                   # number of cards left in the deck
+            ('used_cards', (N_CARD_TYPES,)),       # traded in cards per CardType, reshuffled when the deck is empty
+        ]
+        size = sum(math.prod(shape) for _, shape in self.layout)
+        self.set_buffer(np.zeros(size, dtype=np.int32))
+        self.owners[:] = -1
+        self.update_owner_masks()
+
+    def set_buffer(self, buffer: np.ndarray):
+        self.buffer = buffer
+        offset = 0
+        for name, shape in self.layout:
+            n = math.prod(shape)
+            setattr(self, name, buffer[offset:offset + n].reshape(shape))
+            offset += n
+        self.update_owner_masks()
+
+    # territories of every player as a bitmask (bit i set if the player holds territory i),
+    # derived from owners: set_owner keeps them in sync, bulk writes to owners must be
+    # followed by update_owner_masks
+    def update_owner_masks(self):
+        # sums of distinct powers of two below 2^53 are exact in float64
+        owned = self.owners >= 0
+        masks = np.bincount(self.owners[owned], weights=self.country_bits[owned], minlength=self.num_players)
+        self.owner_masks = [int(mask) for mask in masks]
+
+    def set_owner(self, idx: int, pid: int):
+        prev_pid = int(self.owners[idx])
+        if prev_pid >= 0:
+            self.owner_masks[prev_pid] &= ~(1 << idx)
+        self.owner_masks[pid] |= 1 << idx
+        self.owners[idx] = pid
+
+    def copy(self) -> 'GameState':
+        state = copy.copy(self)
+        state.set_buffer(self.buffer.copy())
+        return state
+
+    def player_countries(self, pid: int) -> np.ndarray:
+        return np.flatnonzero(self.owners == pid)
+
+    def num_countries_owned(self, pid: int) -> int:
+        return self.owner_masks[pid].bit_count()
+
+    def total_troops(self, pid: int) -> int:
+        return int(self.troops[self.owners == pid].sum())
+
+# full game position, see Game.snapshot and Game.restore
+class GameSnapshot(NamedTuple):
+    buffer: np.ndarray
+    num_rounds_played: int
+    current_phase: int
+    current_player: int
+    country_conquered_in_round: bool
+    players: Tuple[int, ...]
+    players_eliminated: Tuple[int, ...]
+    record_size: Optional[int] = None # length of the game record events, if the game is recorded
@@ -0,0 +1,80 @@
+import time
+
+# wall time and call counts of a game (see Game(stats=True)), or of many games merged together:
+# - phases: seconds and calls per (GamePlayState name, player class), the time a decision waits
+#   for its answer is not included, the model forwards are timed separately
+# - times: named timers, 'encode' (get_game_state_encoded) and 'model_forward' (the share
+#   of the game in the batched forward passes that answered its decisions)
+# - counters: 'decisions' (drafts, attacks, blitzes, fortifies and trade-ins), 'battles',
+#   'blitzes', 'conquests', 'encoder_calls', 'fortify_option_calls', 'connectivity_rebuilds'
+#   (fortify options recomputed after territory changes), 'model_forwards'
+# games without stats have self.stats = None and skip all of this
+class GameStats:
+    def __init__(self, num_games: int = 0):
+        self.num_games = num_games
+        self.phase_times = {}
+        self.phase_calls = {}
+        self.times = {}
+        self.counters = {}
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name: str, seconds: float):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+
+    def add_phase(self, phase: str, player_type: str, seconds: float):
+        key = (phase, player_type)
+        self.phase_times[key] = self.phase_times.get(key, 0.0) + seconds
+        self.phase_calls[key] = self.phase_calls.get(key, 0) + 1
+
+    # runs the steps of a phase (see Game.gameplay_steps), timing only the time spent in them
+    def timed_steps(self, steps, phase: str, player_type: str):
+        elapsed = 0.0
+        start = time.perf_counter()
+        try:
+            decision = next(steps)
+            while True:
+                elapsed += time.perf_counter() - start
+                answer = yield decision
+                start = time.perf_counter()
+                decision = steps.send(answer)
+        except StopIteration as stop:
+            elapsed += time.perf_counter() - start
+            return stop.value
+        finally:
+            self.add_phase(phase, player_type, elapsed)
+
+    def merge(self, other: 'GameStats') -> 'GameStats':
+        self.num_games += other.num_games
+        for key, seconds in other.phase_times.items():
+            self.phase_times[key] = self.phase_times.get(key, 0.0) + seconds
+            self.phase_calls[key] = self.phase_calls.get(key, 0) + other.phase_calls[key]
+        for name, seconds in other.times.items():
+            self.add_time(name, seconds)
+        for name, n in other.counters.items():
+            self.count(name, n)
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            'num_games': self.num_games,
+            'phases': {
+                f'{phase}/{player_type}': {'seconds': seconds, 'calls': self.phase_calls[(phase, player_type)]}
+                for (phase, player_type), seconds in sorted(self.phase_times.items())
+            },
+            'times': dict(sorted(self.times.items())),
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    # human readable table for the logs, the slowest phases first
+    def summary(self) -> str:
+        lines = [f"stats of {self.num_games} games"]
+        for (phase, player_type), seconds in sorted(self.phase_times.items(), key=lambda item: -item[1]):
+            calls = self.phase_calls[(phase, player_type)]
+            lines.append(f"  {phase:<8} {player_type:<16} {seconds:10.3f} s {calls:9d} calls {1e6 * seconds / calls:10.1f} us/call")
+        for name, seconds in sorted(self.times.items()):
+            lines.append(f"  {name:<25} {seconds:10.3f} s")
+        for name, n in sorted(self.counters.items()):
+            lines.append(f"  {name:<25} {n:10d}")
+        return '\n'.join(lines)
@@ -0,0 +1,30 @@
+import torch
+import torch.nn as nn
+
+# dense normalized adjacency D^-1/2 (A + I) D^-1/2 of torch_geometric's gcn_norm: messages flow
+# from edge_index[0] to edge_index[1], degrees are in-degrees including the self loop
+def normalized_adjacency(edge_index, num_nodes: int) -> torch.Tensor:
+    edge_index = torch.as_tensor(edge_index, dtype=torch.long)
+    adjacency = torch.zeros(num_nodes, num_nodes)
+    adjacency.index_put_((edge_index[1], edge_index[0]), torch.ones(edge_index.size(1)), accumulate=True)
+    adjacency += torch.eye(num_nodes)
+
+    deg_inv_sqrt = adjacency.sum(dim=1).pow(-0.5)
+    return deg_inv_sqrt[:, None] * adjacency * deg_inv_sqrt[None, :]
+
+# GCNConv for a graph that never changes: the normalized adjacency is computed once and every
+# call is a dense (batched) matmul A @ X @ W + b. the parameters are named like the ones of
+# torch_geometric.nn.GCNConv, so the state dicts of both layers are interchangeable
+class StaticGCNConv(nn.Module):
+    def __init__(self, in_channels, out_channels, edge_index, num_nodes):
+        super(StaticGCNConv, self).__init__()
+        self.in_channels = in_channels
+        self.out_channels = out_channels
+        self.lin = nn.Linear(in_channels, out_channels, bias=False)
+        self.bias = nn.Parameter(torch.zeros(out_channels))
+        nn.init.xavier_uniform_(self.lin.weight)
+        self.register_buffer('adjacency', normalized_adjacency(edge_index, num_nodes), persistent=False)
+
+    def forward(self, x):
+        # x: [num_nodes, in_channels] or [batch_size, num_nodes, in_channels]
+        return torch.matmul(self.adjacency, self.lin(x)) + self.bias
@@ -0,0 +1,172 @@
+import os
+import time
+from typing import List, Optional
+import numpy as np
+import networkx as nx
+
+import matplotlib
+matplotlib.use('Agg') # use TkAgg when running locally
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
+import matplotlib.colors as mcolors
+plt.ion()
+
+from risk.game_map import GameMap
+
+COLOR_PALETTE = list(mcolors.TABLEAU_COLORS.values()) + list(mcolors.CSS4_COLORS.values())
+UNOWNED_COLOR = 'gray'
+
+# the color of every player id, so that each player has the same color on the map plot
+# throughout the game
+def player_colors(num_players: int) -> List[str]:
+    return [COLOR_PALETTE[pid % len(COLOR_PALETTE)] for pid in range(num_players)]
+
+# draws the map of a game incrementally: the edges, the country names and the legend are drawn
+# once into a cached background, a frame only sets the colors of the nodes and the soldier
+# counts of the countries that changed and redraws them on top of the background (blitting).
+# frames come at most max_fps times per second (None: every call), a throttled frame is not
+# lost, the next frame or flush draws the latest position.
+# with blit=False the nodes and labels are regular artists, e.g. for saving frames to files
+class MapRenderer:
+    def __init__(self, game_map: GameMap, player_names: List[str], player_colors: List[str], max_fps: Optional[float] = 10, blit: bool = True):
+        self.game_map = game_map
+        self.player_names = list(player_names)
+        self.player_colors = list(player_colors)
+        self.min_frame_interval = 1 / max_fps if max_fps else 0
+        self.blit = blit
+
+        self.countries = sorted(game_map.nodes(), key=lambda country: country.idx)
+        self.fig, self.ax = plt.subplots(figsize=(18, 10))
+        self.ax.set_axis_off()
+        self.nodes = None
+        self.labels = None
+        self.legend_pids = None
+        self.background = None
+        self.drawn_owners = None
+        self.drawn_troops = None
+        self.pending = None
+        self.last_frame_time = -np.inf
+        if blit:
+            self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+
+    # static part of the map, drawn once
+    def draw_static(self):
+        positions = self.game_map.positions
+        nx.draw_networkx_edges(self.game_map, pos=positions, ax=self.ax)
+        self.nodes = nx.draw_networkx_nodes(
+            self.game_map,
+            pos=positions,
+            nodelist=self.countries,
+            node_color=[UNOWNED_COLOR] * len(self.countries),
+            node_size=3000,
+            ax=self.ax
+        )
+        # the names are above the nodes, so the redrawn nodes do not cover them. text rendering
+        # is most of the cost of a frame, so only the soldier counts are redrawn
+        for country in self.countries:
+            self.ax.annotate(country.name, positions[country], xytext=(0, 24), textcoords='offset points', ha='center', va='bottom', fontsize=9)
+        self.labels = [
+            self.ax.text(*positions[country], '', ha='center', va='center', fontsize=12, fontweight='bold')
+            for country in self.countries
+        ]
+        self.nodes.set_animated(self.blit)
+        for label in self.labels:
+            label.set_animated(self.blit)
+        self.drawn_owners = np.full(len(self.countries), -2)
+        self.drawn_troops = np.full(len(self.countries), -1)
+
+    # (re)draws the legend when the set of players on the map changed, returns whether it did
+    def update_legend(self, owners) -> bool:
+        pids = sorted(set(owners.tolist()) - {-1}, key=lambda pid: self.player_names[pid])
+        if pids == self.legend_pids:
+            return False
+        self.legend_pids = pids
+        legend_elements = [
+            Patch(facecolor=self.player_colors[pid], edgecolor='black', label=self.player_names[pid])
+            for pid in pids
+        ]
+        self.ax.legend(handles=legend_elements, title="Players", loc='best')
+        return True
+
+    def update_artists(self, owners, troops):
+        changed = np.flatnonzero((owners != self.drawn_owners) | (troops != self.drawn_troops))
+        for idx in changed.tolist():
+            self.labels[idx].set_text(str(troops[idx]))
+        if np.any(owners[changed] != self.drawn_owners[changed]):
+            self.nodes.set_facecolor([self.player_colors[pid] if pid >= 0 else UNOWNED_COLOR for pid in owners.tolist()])
+        self.drawn_owners[:] = owners
+        self.drawn_troops[:] = troops
+
+    def on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        self.ax.draw_artist(self.nodes)
+        for label in self.labels:
+            self.ax.draw_artist(label)
+
+    # draws a frame for the given owners and troops, unless the last frame was drawn less than
+    # 1 / max_fps seconds ago and force is not set. returns whether a frame was drawn
+    def draw(self, owners, troops, force: bool = False) -> bool:
+        self.pending = (np.array(owners), np.array(troops))
+        now = time.perf_counter()
+        if not force and now - self.last_frame_time < self.min_frame_interval:
+            return False
+        self.last_frame_time = now
+
+        owners, troops = self.pending
+        self.pending = None
+        if self.nodes is None:
+            self.draw_static()
+        legend_changed = self.update_legend(owners)
+        self.update_artists(owners, troops)
+
+        canvas = self.fig.canvas
+        if self.blit:
+            if legend_changed or self.background is None:
+                canvas.draw() # new background, on_draw draws the nodes and labels on top
+            else:
+                canvas.restore_region(self.background)
+                self.draw_animated()
+                canvas.blit(self.fig.bbox)
+            canvas.flush_events()
+        return True
+
+    # draws the latest throttled frame, if any
+    def flush(self):
+        if self.pending is not None:
+            self.draw(*self.pending, force=True)
+
+    def save(self, path):
+        self.fig.savefig(path)
+
+    def close(self):
+        plt.close(self.fig)
+
+# renders a recorded game (see GameRecord) without playing it: one frame after every `every`
+# recorded actions and one of the final position, saved as numbered png files to output_dir
+# or shown live with max_fps
+def render_record(record, output_dir=None, every: int = 1, max_fps: Optional[float] = 10):
+    from risk.game import Game
+
+    colors = player_colors(len(record.player_names))
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        renderer = MapRenderer(GameMap(), record.player_names, colors, max_fps=None, blit=False)
+    else:
+        renderer = MapRenderer(GameMap(), record.player_names, colors, max_fps=max_fps)
+
+    num_actions = len(record.actions())
+    n_frames = 0
+    for i, game in enumerate(Game.replay_steps(record)):
+        if i % every and i != num_actions:
+            continue
+        renderer.draw(game.state.owners, game.state.troops)
+        if output_dir:
+            renderer.save(os.path.join(output_dir, f'frame_{n_frames:05d}.png'))
+        n_frames += 1
+    renderer.flush()
+    if output_dir:
+        renderer.close()
+    return n_frames
@@ -1,37 +1,80 @@
 from abc import abstractmethod
+import copy
+from typing import List, TYPE_CHECKING
 from risk.card import *
 from risk.country import Country
-import risk.game
+if TYPE_CHECKING:
+    import risk.game
 
+# drives a generator of decisions (see Game.gameplay_steps) to the end by letting
+# each deciding player answer its own decisions, returns the generator return value
+def answer_decisions(steps):
+    try:
+        decision = next(steps)
+        while True:
+            decision = steps.send(decision.player.select_attack_action(decision))
+    except StopIteration as stop:
+        return stop.value
+
+# player attributes are views into the GameState of the game the player is in,
+# the player id (pid) is the players seat in the game.
+# is_rl marks the learning players, whose results the game reports (see Game.gameplay_steps)
 class Player:
     game: 'risk.game.Game'
+    is_rl = False
+
     def __init__(self, name):
         self.name = name
-        self.countries = []
-        self.unassigned_soldiers = 0
-        self.cards = {card_type: [] for card_type in CardType}
-        self.n_card_trade_ins = 0
+        self.pid: int = None
+
+    # copy of the player for a cloned game, see Game.clone
+    def copy_for(self, game: 'risk.game.Game'):
+        player = copy.copy(self)
+        player.game = game
+        return player
+
+    @property
+    def countries(self) -> List[Country]:
+        return [self.game.countries[idx] for idx in self.game.state.player_countries(self.pid)]
+
+    @property
+    def unassigned_soldiers(self) -> int:
+        return int(self.game.state.unassigned[self.pid])
 
-    def add_country(self, country: Country):
-        self.countries.append(country)
+    @unassigned_soldiers.setter
+    def unassigned_soldiers(self, value: int):
+        self.game.state.unassigned[self.pid] = value
+
+    @property
+    def n_card_trade_ins(self) -> int:
+        return int(self.game.state.trade_ins[self.pid])
+
+    @n_card_trade_ins.setter
+    def n_card_trade_ins(self, value: int):
+        self.game.state.trade_ins[self.pid] = value
+
+    @property
+    def cards(self):
+        return {card_type: [Card(card_type)] * int(n) for card_type, n in zip(CARD_TYPES, self.game.state.cards[self.pid])}
 
-    def remove_country(self, country: Country):
-        self.countries.remove(country)
-    
     def get_cards(self):
-        return {k: len(v) for k,v in self.cards.items()}
+        return {card_type: int(n) for card_type, n in zip(CARD_TYPES, self.game.state.cards[self.pid])}
+
+    def get_total_soldiers(self) -> int:
+        return self.game.state.total_troops(self.pid)
 
     def get_trade_in_options(self):
         options = []
+        card_counts = self.game.state.cards[self.pid]
 
-        if sum([min(1, len(v)) for v in self.cards.values()]) >= 3:
+        if (card_counts > 0).sum() >= 3:
             # can trade in one of each
             options.append([Card(card_type) for card_type in CardType])
         
-        for k, v in self.cards.items():
-            if len(v) >= 3:
+        for card_type, n in zip(CARD_TYPES, card_counts):
+            if n >= 3:
                 # can trade in three of a kind
-                options.append([Card(k)]*3)
+                options.append([Card(card_type)]*3)
         
         return options
             
@@ -53,6 +96,12 @@ class Player:
     def process_attack_phase(self):
         pass
 
+    # the attack phase as a generator of decisions for the caller to answer
+    # (see Game.gameplay_steps), players deciding on their own yield nothing
+    def attack_phase_steps(self):
+        self.process_attack_phase()
+        yield from ()
+
     @abstractmethod
     def process_fortify_phase(self):
         pass
@@ -1,8 +1,17 @@
 from risk.country import *
 from risk.player import Player
+from risk.battle_odds import conquest_probability
 import logging
 
 class PlayerHeuristic(Player):
+    # with blitz, each selected attack is fought until the defender is conquered or the
+    # attacking country is down to one soldier, resolved in one call (see Game.blitz).
+    # attacks with lower odds than min_conquest_probability are skipped after the first two attacks
+    def __init__(self, name, blitz=False, min_conquest_probability=0.3):
+        super().__init__(name)
+        self.blitz = blitz
+        self.min_conquest_probability = min_conquest_probability
+
     def process_cards_phase(self):
         options = self.get_trade_in_options()
         if options:
@@ -25,7 +34,7 @@ class PlayerHeuristic(Player):
             logging.info(f"\x1b[1m\nAttack Phase - {self}\x1b[0m")
 
         # can make heuristic "better" by increasing the upper limit, now set to 50 attacks per round
-        num_soldiers_total = sum(c.army.n_soldiers for c in self.countries)
+        num_soldiers_total = self.get_total_soldiers()
         max_attacks_per_round = min(25, max(1, num_soldiers_total - 18))
         attack_iter = 0
 
@@ -45,11 +54,15 @@ class PlayerHeuristic(Player):
             defender_country, defender_country_n_soldiers = selected_attack[1]
 
             # check if skip is optimal
-            if defender_country_n_soldiers > attacker_country_n_soldiers and attack_iter > 1:
+            win_probability = conquest_probability(attacker_country_n_soldiers - 1, defender_country_n_soldiers)
+            if win_probability < self.min_conquest_probability and attack_iter > 1:
                 return
 
-            attacking_soldiers = min(3, attacker_country_n_soldiers-1)
-            self.game.attack(self, attacker_country, defender_country, attacking_soldiers)
+            if self.blitz:
+                self.game.blitz(self, attacker_country, defender_country)
+            else:
+                attacking_soldiers = min(3, attacker_country_n_soldiers-1)
+                self.game.attack(self, attacker_country, defender_country, attacking_soldiers)
             attack_iter += 1
 
     # this is just a basic heuristic, defining and coding a near optimal fortify strategy
@@ -59,7 +72,7 @@ class PlayerHeuristic(Player):
             logging.info(f"\x1b[1m\nFortify Phase - {self}\x1b[0m")
         
         destination_countries = set() # set of countries that have received fortify troops in this round
-        num_soldiers_total = sum(c.army.n_soldiers for c in self.countries)
+        num_soldiers_total = self.get_total_soldiers()
         max_fortify_moves = max(1, num_soldiers_total - 15)
         for fortify_iter in range(max_fortify_moves):
             fortify_options_ranked = self.game.get_fortify_options(self)
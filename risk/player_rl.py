@@ -1,82 +1,146 @@
 from risk.country import *
-from risk.player import Player
+from risk.player import Player, answer_decisions
+from risk.topology import get_topology
+from risk.rollout_buffer import RolloutBuffer
+from typing import NamedTuple
 import logging
+import time
+import numpy as np
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torch_geometric.nn import GCNConv
+from risk.gcn import StaticGCNConv
 
+# the map is static, so the graph and the action encoding are stored on the model as
+# (non persistent) buffers: they move with model.to(device) and stay out of checkpoints.
+# edge_index and action_table default to the game map (see risk.topology).
+# with dense (default) the graph convolutions are StaticGCNConv, else torch_geometric's GCNConv,
+# both have the same parameters and outputs
 class RiskGNN(nn.Module):
-    def __init__(self, in_channels_node, hidden_dim, num_actions):
+    def __init__(self, in_channels_node, hidden_dim, num_actions, edge_index=None, action_table=None, dense=True):
         super(RiskGNN, self).__init__()
-        self.conv1 = GCNConv(in_channels_node, hidden_dim)
-        self.conv2 = GCNConv(hidden_dim, hidden_dim)
-        self.action_head = ActionHead(hidden_dim, num_actions)
-
-    def forward(self, x, edge_index, action_lookup_table):
+        if edge_index is None or action_table is None:
+            topology = get_topology()
+            edge_index = topology.edge_index if edge_index is None else edge_index
+            action_table = topology.action_table if action_table is None else action_table
+
+        self.register_buffer('edge_index', torch.tensor(np.asarray(edge_index), dtype=torch.long), persistent=False)
+        self.dense = dense
+        if dense:
+            num_nodes = int(self.edge_index.max()) + 1
+            self.conv1 = StaticGCNConv(in_channels_node, hidden_dim, self.edge_index, num_nodes)
+            self.conv2 = StaticGCNConv(hidden_dim, hidden_dim, self.edge_index, num_nodes)
+        else:
+            from torch_geometric.nn import GCNConv
+            self.conv1 = GCNConv(in_channels_node, hidden_dim)
+            self.conv2 = GCNConv(hidden_dim, hidden_dim)
+        self.action_head = ActionHead(hidden_dim, num_actions, action_table)
+
+    def forward(self, x, edge_index=None):
         # x: node features
-        # edge_index: edge list array
-        x = F.relu(self.conv1(x, edge_index))
-        x = F.relu(self.conv2(x, edge_index)) # (num_nodes, hidden_dim)
-
-        logits = self.action_head(x, action_lookup_table)  # [num_actions]
+        # edge_index: edge list array, defaults to the map of the model (only with dense=False)
+        # x: [num_nodes, in_channels] or batched [batch_size, num_nodes, in_channels],
+        # all graphs in a batch share the same edge_index
+        if self.dense:
+            assert edge_index is None, "the dense model only supports its own graph"
+            x = F.relu(self.conv1(x))
+            x = F.relu(self.conv2(x)) # ([batch_size], num_nodes, hidden_dim)
+        else:
+            if edge_index is None:
+                edge_index = self.edge_index
+            x = F.relu(self.conv1(x, edge_index))
+            x = F.relu(self.conv2(x, edge_index)) # ([batch_size], num_nodes, hidden_dim)
+
+        logits = self.action_head(x)  # ([batch_size], num_actions)
         return logits
     
 class ActionHead(nn.Module):
-    def __init__(self, node_embed_dim, num_actions):
+    def __init__(self, node_embed_dim, num_actions, action_table):
         super(ActionHead, self).__init__()
         self.node_embed_dim = node_embed_dim
         self.num_actions = num_actions
+        assert action_table.n_actions == num_actions
 
         self.skip_attack_embed = nn.Parameter(torch.zeros(node_embed_dim))
         self.skip_defend_embed = nn.Parameter(torch.zeros(node_embed_dim))
 
+        # the skip action has index -1, which selects the skip embedding appended after the nodes
+        self.register_buffer('attack_indices', torch.tensor(action_table.attackers, dtype=torch.long), persistent=False) # [num_actions]
+        self.register_buffer('defend_indices', torch.tensor(action_table.defenders, dtype=torch.long), persistent=False) # [num_actions]
+        self.register_buffer('n_soldiers', torch.tensor(action_table.dice, dtype=torch.float32).unsqueeze(1), persistent=False) # [num_actions, 1]
+
         self.mlp = nn.Sequential(
             nn.Linear(2 * node_embed_dim + 1, 128),
             nn.ReLU(),
             nn.Linear(128, 1)
         )
 
-    def forward(self, node_embeddings, action_lookup_table):
-        attack_indices = torch.tensor(
-            [action[0] for action in action_lookup_table],
-            dtype=torch.long,
-            device=node_embeddings.device
-        )  # [num_actions]
-        
-        defend_indices = torch.tensor(
-            [action[1] for action in action_lookup_table],
-            dtype=torch.long,
-            device=node_embeddings.device
-        )  # [num_actions]
+    def forward(self, node_embeddings):
+        batch_shape = node_embeddings.shape[:-2] # empty if not batched
+        skip_attack_embed = self.skip_attack_embed.expand(*batch_shape, 1, -1)
+        skip_defend_embed = self.skip_defend_embed.expand(*batch_shape, 1, -1)
+        attack_embeds = torch.cat([node_embeddings, skip_attack_embed], dim=-2)[..., self.attack_indices, :] # [..., num_actions, node_embed_dim]
+        defend_embeds = torch.cat([node_embeddings, skip_defend_embed], dim=-2)[..., self.defend_indices, :] # [..., num_actions, node_embed_dim]
         
-        n_soldiers = torch.tensor(
-            [action[2] for action in action_lookup_table],
-            dtype=torch.float32,
-            device=node_embeddings.device
-        ).unsqueeze(1)  # [num_actions, 1]
-        
-        skip_mask = (attack_indices == -1)  # [num_actions]
-        attack_embeds = self.skip_attack_embed.unsqueeze(0).repeat(attack_indices.size(0), 1)  # [num_actions, node_embed_dim]
-        defend_embeds = self.skip_defend_embed.unsqueeze(0).repeat(defend_indices.size(0), 1)  # [num_actions, node_embed_dim]
-        
-        non_skip_mask = ~skip_mask  # [num_actions]
-        attack_embeds[non_skip_mask] = node_embeddings[attack_indices[non_skip_mask]]
-        defend_embeds[non_skip_mask] = node_embeddings[defend_indices[non_skip_mask]]
-        
-        action_inputs = torch.cat([attack_embeds, defend_embeds, n_soldiers], dim=1)  # [num_actions, 2 * node_embed_dim + 1]
-        logits = self.mlp(action_inputs).squeeze()  # [num_actions]
+        n_soldiers = self.n_soldiers.expand(*batch_shape, self.num_actions, 1)
+        action_inputs = torch.cat([attack_embeds, defend_embeds, n_soldiers], dim=-1)  # [..., num_actions, 2 * node_embed_dim + 1]
+        logits = self.mlp(action_inputs).squeeze(-1)  # [..., num_actions]
         
         return logits
 
+# an attack phase decision waiting for an action, see PlayerRL.attack_phase_steps
+class AttackDecision(NamedTuple):
+    player: 'PlayerRL'
+    node_features: torch.Tensor # [num_countries, n_features]
+    valid_action_mask: torch.Tensor # [num_actions]
+
+# acting mode: samples actions for decisions from any number of games in a single batched
+# forward pass without autograd, returns (action_idx, log_prob) per decision.
+# the action is sampled with the Gumbel-max trick, i.e. the argmax of the masked logits
+# perturbed with Gumbel noise, which is distributed as the masked softmax
+@torch.inference_mode()
+def select_attack_actions(model, device, decisions):
+    start = time.perf_counter()
+    node_features_tensor = torch.stack([d.node_features for d in decisions]).to(device)
+    valid_action_mask = torch.stack([d.valid_action_mask for d in decisions]).to(device)
+
+    logits = model(node_features_tensor) # [batch_size, num_actions]
+
+    # mask away invalid actions
+    masked_logits = logits.masked_fill(~valid_action_mask, float('-inf'))
+
+    gumbel_noise = -torch.empty_like(masked_logits).exponential_().log()
+    action_indices = (masked_logits + gumbel_noise).argmax(dim=1)
+    log_probs = F.log_softmax(masked_logits, dim=1).gather(1, action_indices.unsqueeze(1)).squeeze(1)
+    answers = list(zip(action_indices.tolist(), log_probs.tolist()))
+
+    # every game answered by this forward is charged an equal share of its time, see GameStats
+    elapsed = time.perf_counter() - start
+    for decision in decisions:
+        stats = decision.player.game.stats
+        if stats is not None:
+            stats.count('model_forwards')
+            stats.add_time('model_forward', elapsed / len(decisions))
+    return answers
+
 class PlayerRL(Player):
-    def __init__(self, name, model, device):
+    is_rl = True
+
+    # features_dtype: dtype of the node features stored in the experiences, e.g. np.float16
+    # halves their memory (see RolloutBuffer)
+    def __init__(self, name, model, device, features_dtype=np.float32):
         super().__init__(name)
         self.model = model  
-        self.experiences = []
+        self.features_dtype = features_dtype
+        self.experiences = RolloutBuffer(features_dtype=features_dtype)
         self.device = device
 
+    def copy_for(self, game):
+        player = super().copy_for(game)
+        player.experiences = RolloutBuffer(features_dtype=self.features_dtype)
+        return player
+
     def process_cards_phase(self):
        options = self.get_trade_in_options()
        if options:
@@ -94,15 +158,22 @@ class PlayerRL(Player):
             # assign one soldier to country before we re-evaluate the threat ratios
             self.game.assign_soldiers(self, country_selected, 1)
 
+    def select_attack_action(self, decision: AttackDecision):
+        return select_attack_actions(self.model, self.device, [decision])[0]
+
     def process_attack_phase(self):
+        answer_decisions(self.attack_phase_steps())
+
+    # yields an AttackDecision for every attack and expects the selected
+    # (action_idx, log_prob) to be sent back, see risk.vec_game
+    def attack_phase_steps(self):
         if self.game.log_all:
             logging.info(f"\x1b[1m\nAttack Phase - {self}\x1b[0m")
         
-        num_soldiers_total = sum(c.army.n_soldiers for c in self.countries)
+        num_soldiers_total = self.get_total_soldiers()
         max_attacks_per_round = min(25, max(1, num_soldiers_total - 18))
         game_won = False
         no_attack = True
-        current_round_experiences = []
 
         attack_iter = 0
         while True:
@@ -114,18 +185,10 @@ class PlayerRL(Player):
             node_features= self.game.get_game_state_encoded(self)
             attack_options_array = self.game.get_attack_options_encoded(self) # for valid action mask
             
-            valid_action_mask = torch.tensor(attack_options_array, dtype=torch.bool).to(self.device)
-            node_features_tensor = torch.tensor(node_features, dtype=torch.float32).to(self.device)
-            edge_index_tensor = torch.tensor(self.game.edge_list_array, dtype=torch.long).to(self.device)
+            valid_action_mask = torch.tensor(attack_options_array, dtype=torch.bool)
+            node_features_tensor = torch.tensor(node_features, dtype=torch.float32)
 
-            logits = self.model(node_features_tensor, edge_index_tensor, self.game.action_lookup_table)
-            
-            # mask away invalid actions
-            masked_logits = logits.clone()
-            masked_logits[~valid_action_mask] = float('-inf')
-
-            action_probs = F.softmax(masked_logits, dim=0)
-            action_idx = torch.multinomial(action_probs, num_samples=1).item()
+            action_idx, log_prob = yield AttackDecision(self, node_features_tensor, valid_action_mask)
             attack_idx, defend_idx, n_soldiers = self.game.action_lookup_table[action_idx]
             attack_iter += 1
 
@@ -139,36 +202,24 @@ class PlayerRL(Player):
                 defend_country = self.game.countries[defend_idx]
                 reward, game_won = self.game.attack(self, attack_country, defend_country, n_soldiers)
 
-                current_round_experiences.append({
-                    'node_features': node_features_tensor.cpu(),
-                    'edge_index': edge_index_tensor.cpu(),
-                    'valid_action_mask': valid_action_mask.cpu(),
-                    'action_idx': action_idx,
-                    'reward': reward,
-                    'action_probs': action_probs.detach().cpu()
-                })
+                self.experiences.add(node_features, attack_options_array, action_idx, reward, log_prob, player=self.pid)
 
                 if game_won:
                     break
         
         if no_attack:
-            current_round_experiences.append({
-                    'node_features': node_features_tensor.cpu(),
-                    'edge_index': edge_index_tensor.cpu(),
-                    'valid_action_mask': valid_action_mask.cpu(),
-                    'action_idx': action_idx,
-                    'reward': -25, #sharp penatly for not making an attack in round
-                    'action_probs': action_probs.detach().cpu()
-                })
-        
-        self.experiences.extend(current_round_experiences)
+            self.experiences.add(
+                node_features, attack_options_array, action_idx,
+                -25, #sharp penatly for not making an attack in round
+                log_prob, player=self.pid
+            )
         
     def process_fortify_phase(self):
         if self.game.log_all:
             logging.info(f"\x1b[1m\nFortify Phase - {self}\x1b[0m")
         
         destination_countries = set() # set of countries that have received fortify troops in this round
-        num_soldiers_total = sum(c.army.n_soldiers for c in self.countries)
+        num_soldiers_total = self.get_total_soldiers()
         max_fortify_moves = max(1, num_soldiers_total - 15)
         for fortify_iter in range(max_fortify_moves):
             fortify_options_ranked = self.game.get_fortify_options(self)
@@ -0,0 +1,106 @@
+import numpy as np
+import torch
+
+# experiences of RL players in preallocated contiguous arrays instead of one dict of tensors per step.
+# the arrays are allocated on the first add (their shapes are taken from the first step) and grow
+# by doubling. node features can be stored as float16, the valid action masks are bit-packed.
+# every step records the episode and the player it belongs to, the static graph is stored once
+class RolloutBuffer:
+    def __init__(self, capacity: int = 256, features_dtype=np.float32, edge_index=None):
+        self.capacity = capacity
+        self.features_dtype = np.dtype(features_dtype)
+        self.edge_index = edge_index
+        self.size = 0
+        self.num_actions = None
+        self.arrays = None
+
+    def allocate(self, node_features_shape, num_actions, capacity):
+        self.num_actions = num_actions
+        self.capacity = capacity
+        self.arrays = {
+            'node_features': np.zeros((capacity, *node_features_shape), dtype=self.features_dtype),
+            'valid_action_mask': np.zeros((capacity, (num_actions + 7) // 8), dtype=np.uint8), # bit-packed
+            'action_idx': np.zeros(capacity, dtype=np.int64),
+            'reward': np.zeros(capacity, dtype=np.float64),
+            'log_prob': np.zeros(capacity, dtype=np.float32),
+            'episode': np.zeros(capacity, dtype=np.int32),
+            'player': np.zeros(capacity, dtype=np.int32),
+        }
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        arrays = self.arrays
+        self.allocate(arrays['node_features'].shape[1:], self.num_actions, capacity)
+        for name, array in arrays.items():
+            self.arrays[name][:self.size] = array[:self.size]
+
+    def add(self, node_features, valid_action_mask, action_idx, reward, log_prob, player=0, episode=0):
+        valid_action_mask = np.asarray(valid_action_mask, dtype=bool)
+        if self.arrays is None:
+            self.allocate(np.shape(node_features), len(valid_action_mask), self.capacity)
+        self.reserve(self.size + 1)
+
+        i = self.size
+        self.arrays['node_features'][i] = node_features
+        self.arrays['valid_action_mask'][i] = np.packbits(valid_action_mask)
+        self.arrays['action_idx'][i] = action_idx
+        self.arrays['reward'][i] = reward
+        self.arrays['log_prob'][i] = log_prob
+        self.arrays['episode'][i] = episode
+        self.arrays['player'][i] = player
+        self.size += 1
+
+    # appends all steps of another buffer, relabeled with episode if given
+    def extend(self, other: 'RolloutBuffer', episode=None):
+        if other.size == 0:
+            return
+        if self.arrays is None:
+            self.allocate(other.arrays['node_features'].shape[1:], other.num_actions, max(self.capacity, other.size))
+        self.reserve(self.size + other.size)
+
+        for name, array in self.arrays.items():
+            array[self.size:self.size + other.size] = other.arrays[name][:other.size]
+        if episode is not None:
+            self.arrays['episode'][self.size:self.size + other.size] = episode
+        if self.edge_index is None:
+            self.edge_index = other.edge_index
+        self.size += other.size
+
+    @classmethod
+    def concatenate(cls, buffers, edge_index=None, episode=None):
+        buffers = list(buffers)
+        buffer = cls(
+            capacity=max(1, sum(b.size for b in buffers)),
+            features_dtype=buffers[0].features_dtype if buffers else np.float32,
+            edge_index=edge_index
+        )
+        for other in buffers:
+            buffer.extend(other, episode)
+        return buffer
+
+    def __len__(self):
+        return self.size
+
+    def valid_action_masks(self) -> np.ndarray:
+        packed = self.arrays['valid_action_mask'][:self.size]
+        return np.unpackbits(packed, axis=1, count=self.num_actions).astype(bool)
+
+    # the filled part of the arrays as tensors, the CPU tensors share memory with the buffer
+    # (except for the unpacked masks), with a device they are copied once per array
+    def tensors(self, device=None):
+        tensors = {name: torch.from_numpy(array[:self.size]) for name, array in self.arrays.items() if name != 'valid_action_mask'}
+        tensors['valid_action_mask'] = torch.from_numpy(self.valid_action_masks())
+        if device is not None:
+            tensors = {name: tensor.to(device, non_blocking=True) for name, tensor in tensors.items()}
+        tensors['node_features'] = tensors['node_features'].float()
+        return tensors
+
+    # only the filled part of the arrays is pickled, e.g. when sent to another process
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.arrays is not None:
+            state['arrays'] = {name: array[:self.size].copy() for name, array in self.arrays.items()}
+            state['capacity'] = self.size
+        return state
@@ -0,0 +1,115 @@
+import copy
+import queue
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from risk.rollout_buffer import RolloutBuffer
+from risk.vec_game import VecGame
+
+# all RL experiences of a finished game in one RolloutBuffer, note that at end of game the
+# eliminated list includes all players, including winner
+def collect_experiences(game, episode=0):
+    return RolloutBuffer.concatenate(
+        [player.experiences for player in game.players_eliminated if player.is_rl],
+        edge_index=game.edge_list_array,
+        episode=episode
+    )
+
+def self_play_worker(worker_id, shared_model, version, weights_lock, experience_queue, stop_event, make_players, num_envs, seed_sequence, game_kwargs):
+    torch.set_num_threads(1)
+    torch.manual_seed(torch.initial_seed() + worker_id)
+
+    model = copy.deepcopy(shared_model)
+    local_version = -1
+
+    while not stop_event.is_set():
+        # refresh the local weights if the learner has published new ones
+        if version.value != local_version:
+            with weights_lock:
+                model.load_state_dict(shared_model.state_dict())
+                local_version = version.value
+
+        vec_game = VecGame(lambda: make_players(model, 'cpu'), num_envs, seed=seed_sequence.spawn(1)[0], **game_kwargs)
+        for game, _ in vec_game.play(num_envs):
+            # only the filled part of the buffer is pickled into the queue
+            episode = (local_version, collect_experiences(game), game.stats)
+            while not stop_event.is_set():
+                try:
+                    experience_queue.put(episode, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    # episodes still buffered for a stopped learner are dropped instead of blocking the exit
+    experience_queue.cancel_join_thread()
+
+# K worker processes play games with a read only cpu copy of the model, the weights are shared
+# through shared memory and refreshed by the workers when the version counter changes.
+# finished episodes are streamed back to the learner through a bounded queue, which limits
+# how many episodes can be played with outdated weights.
+# the workers get independent seeds spawned from seed, for reproducible game randomness
+class SelfPlayPool:
+    def __init__(self, model, make_players, num_workers, num_envs=1, max_queued_episodes=None, seed=None, **game_kwargs):
+        ctx = mp.get_context('spawn')
+        self.shared_model = copy.deepcopy(model).cpu()
+        self.shared_model.share_memory()
+        self.version = ctx.Value('i', 0)
+        self.weights_lock = ctx.Lock()
+        self.experience_queue = ctx.Queue(maxsize=max_queued_episodes or 2 * num_workers * num_envs)
+        self.stop_event = ctx.Event()
+
+        game_kwargs = {'display_map': False, 'log_all': False, 'eval_log': False, **game_kwargs}
+        seed_sequences = np.random.SeedSequence(seed).spawn(num_workers)
+        self.workers = [
+            ctx.Process(
+                target=self_play_worker,
+                args=(worker_id, self.shared_model, self.version, self.weights_lock, self.experience_queue,
+                      self.stop_event, make_players, num_envs, seed_sequences[worker_id], game_kwargs),
+                daemon=True
+            )
+            for worker_id in range(num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    # copy the learner weights into shared memory, workers pick them up before their next games
+    def publish(self, model):
+        with self.weights_lock:
+            with torch.no_grad():
+                for shared_param, param in zip(self.shared_model.state_dict().values(), model.state_dict().values()):
+                    shared_param.copy_(param)
+            self.version.value += 1
+
+    # generator of num_episodes RolloutBuffers, see collect_experiences.
+    # the GameStats of the games (if the pool was created with stats=True) are merged into stats.
+    # while waiting for an episode the workers are checked every poll_interval seconds, a worker
+    # that exited (e.g. crashed or was killed) raises a RuntimeError instead of waiting forever
+    def episodes(self, num_episodes, stats=None, poll_interval=1.0):
+        for _ in range(num_episodes):
+            while True:
+                try:
+                    _, experiences, game_stats = self.experience_queue.get(timeout=poll_interval)
+                    break
+                except queue.Empty:
+                    self.check_workers()
+            if stats is not None and game_stats is not None:
+                stats.merge(game_stats)
+            yield experiences
+
+    def check_workers(self):
+        for worker_id, worker in enumerate(self.workers):
+            if not worker.is_alive():
+                raise RuntimeError(f"self-play worker {worker_id} exited with code {worker.exitcode}")
+
+    def close(self):
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
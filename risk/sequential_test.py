@@ -0,0 +1,55 @@
+import math
+from statistics import NormalDist
+
+# Wald's sequential probability ratio test for the win rate p of a series of games:
+# H0: p <= p0 (below) against H1: p >= p1 (above), with error rates alpha (deciding above when
+# p <= p0) and beta (deciding below when p >= p1). win rates between p0 and p1 are the
+# indifference zone, the narrower it is the more games the test needs
+class SPRT:
+    def __init__(self, p0: float, p1: float, alpha: float = 0.05, beta: float = 0.05):
+        assert 0 < p0 < p1 < 1
+        self.p0 = p0
+        self.p1 = p1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.win_llr = math.log(p1 / p0)
+        self.loss_llr = math.log((1 - p1) / (1 - p0))
+        self.llr = 0.0
+        self.wins = 0
+        self.games = 0
+        self.decision = None # 'above' or 'below' once the log likelihood ratio crossed a bound
+
+    # a test of "win rate above threshold" with the indifference zone threshold +- indifference
+    @classmethod
+    def around(cls, threshold: float, indifference: float = 0.05, alpha: float = 0.05, beta: float = 0.05) -> 'SPRT':
+        return cls(max(threshold - indifference, 1e-6), min(threshold + indifference, 1 - 1e-6), alpha, beta)
+
+    # games after the decision still count for the win rate, but do not change the decision
+    def update(self, won: bool):
+        self.games += 1
+        self.wins += int(won)
+        self.llr += self.win_llr if won else self.loss_llr
+        if self.decision is None:
+            if self.llr >= self.upper:
+                self.decision = 'above'
+            elif self.llr <= self.lower:
+                self.decision = 'below'
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+    def confidence_interval(self, confidence: float = 0.95):
+        return wilson_interval(self.wins, self.games, confidence)
+
+# Wilson score interval of a binomial proportion. after an early stop it is only approximate,
+# the stopping rule makes the observed win rate slightly biased towards the decision
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95):
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
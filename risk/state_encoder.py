@@ -0,0 +1,94 @@
+import numpy as np
+
+N_NODE_FEATURES = 14
+NORMALIZED_FEATURES = [1, 2, 4, 5, 6, 8, 9, 10]
+
+# node features of Game.get_game_state_encoded for one player of one game, computed
+# incrementally: the raw (unnormalized) feature matrix is cached together with the owners
+# and troops it was computed from. on the next call only the rows of the territories that
+# changed since then and of their neighbors are recomputed, all other rows only depend on
+# territories that did not change. the continent flags are recomputed from the ownership
+# masks every call, the normalization and the round number are applied to a copy
+class StateEncoder:
+    def __init__(self, game, player):
+        self.game = game
+        self.pid = player.pid
+        self.topology = game.topology
+        self.raw_features = np.zeros((game.num_countries, N_NODE_FEATURES))
+        self.owners = None
+        self.troops = None
+
+    def encode(self):
+        owners = self.game.state.owners
+        troops = self.game.state.troops
+        if self.owners is None:
+            dirty = np.ones(len(owners), dtype=bool)
+        else:
+            changed = (owners != self.owners) | (troops != self.troops)
+            dirty = changed | self.topology.adjacency[changed].any(axis=0)
+        if dirty.any():
+            self.update_rows(dirty)
+        self.owners = owners.copy()
+        self.troops = troops.copy()
+
+        node_features = self.raw_features.copy()
+        self.set_continent_flags(node_features)
+
+        # standardize features, columns with a max of 0 are set to 0
+        normalized = node_features[:, NORMALIZED_FEATURES]
+        max_vals = normalized.max(axis=0)
+        node_features[:, NORMALIZED_FEATURES] = np.divide(normalized, max_vals, out=np.zeros_like(normalized), where=max_vals != 0)
+
+        node_features[:, 12] = (self.game.num_rounds_played + 1) / self.game.max_rounds
+        return node_features
+
+    # recomputes every feature but the continent flag of the territories in rows, the
+    # frontiers come from the ownership masks: a country borders another player if its
+    # neighbor mask and the mask of its owner differ
+    def update_rows(self, rows):
+        owners = self.game.state.owners.tolist()
+        troops = self.game.state.troops.tolist()
+        owner_masks = self.game.state.owner_masks
+        own_mask = owner_masks[self.pid]
+        neighbor_lists = self.topology.neighbor_lists
+        neighbor_masks = self.topology.neighbor_masks
+        for idx in np.flatnonzero(rows).tolist():
+            owner = owners[idx]
+            n_soldiers = troops[idx]
+            own_country = owner == self.pid
+            features = [0.0] * N_NODE_FEATURES
+
+            # soldier diffs to the neighbors held by another player than the country owner
+            foreign_neighbors = neighbor_masks[idx] & ~owner_masks[owner]
+            if foreign_neighbors:
+                soldier_diffs = [n_soldiers - troops[n] for n in neighbor_lists[idx] if foreign_neighbors >> n & 1]
+                diff_offset = 3 if own_country else 7
+                features[diff_offset:diff_offset + 4] = [
+                    len(soldier_diffs),
+                    sum(soldier_diffs) / len(soldier_diffs),
+                    min(soldier_diffs),
+                    max(soldier_diffs)
+                ]
+
+            if own_country:
+                features[0] = 1
+                features[1] = n_soldiers
+            else:
+                features[2] = n_soldiers
+                # enemy country bordering any country of the player
+                features[12] = neighbor_masks[idx] & own_mask != 0
+
+            self.raw_features[idx] = features
+
+    # check if conquering country will secure continent,
+    # i.e. the country is the only enemy country left in the continent
+    def set_continent_flags(self, node_features):
+        topology = self.topology
+        own_mask = self.game.state.owner_masks[self.pid]
+        securing_mask = 0
+        for continent_mask in topology.continent_masks:
+            enemy_mask = continent_mask & ~own_mask
+            if enemy_mask and not enemy_mask & (enemy_mask - 1):
+                securing_mask |= enemy_mask
+        can_attack = node_features[:, 12].astype(bool)
+        node_features[:, 13] = can_attack & topology.mask_to_array(securing_mask)
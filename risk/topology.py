@@ -0,0 +1,92 @@
+import numpy as np
+from risk.country import COUNTRIES, CONTINENTS, BORDERS, country_instances
+
+# the attack action encoding as arrays, slot i attacks action_defenders[i] from
+# action_attackers[i] with action_dice[i] dice, the last slot is the skip action (-1, -1, 0)
+class ActionTable:
+    def __init__(self, action_lookup_table):
+        self.n_actions = len(action_lookup_table)
+        self.attackers, self.defenders, self.dice = (np.array(column) for column in zip(*action_lookup_table))
+        self.skip_action_idx = self.n_actions - 1
+        for value in (self.attackers, self.defenders, self.dice):
+            value.setflags(write=False)
+
+    # 1 for the attacks the player can make (own country with more soldiers than dice
+    # against an enemy neighbor) and for the skip action, else 0
+    def valid_action_mask(self, owners: np.ndarray, troops: np.ndarray, pid: int) -> np.ndarray:
+        attackers = self.attackers[:-1]
+        defenders = self.defenders[:-1]
+        mask = np.ones(self.n_actions)
+        mask[:-1] = (owners[attackers] == pid) & (owners[defenders] != pid) & (troops[attackers] > self.dice[:-1])
+        return mask
+
+# the neighbors of every country (by idx) and the borders as (u, v) index pairs, in the order
+# the networkx GameMap built from the same borders has them: neighbors in the order of their
+# first border with the country, and u is the country that is first listed in BORDERS
+def borders_to_graph(borders):
+    neighbors = {}
+    for u, v in borders:
+        u, v = country_instances[u].idx, country_instances[v].idx
+        for a, b in ((u, v), (v, u)):
+            neighbors.setdefault(a, [])
+            if b not in neighbors[a]:
+                neighbors[a].append(b)
+
+    order = {idx: position for position, idx in enumerate(neighbors)}
+    edges = [(u, v) for u in neighbors for v in neighbors[u] if order[u] < order[v]]
+    return neighbors, edges
+
+# immutable compiled form of the map used by the engine: neighbor lists, adjacency matrix,
+# the GNN edge index, ownership bitboards and the attack action encoding, all indexed by
+# Country.idx. it is built from risk.country.BORDERS, the networkx GameMap is only used for drawing
+class Topology:
+    def __init__(self, borders=BORDERS):
+        countries = sorted(COUNTRIES)
+        self.num_countries = len(countries)
+
+        # neighbors in GameMap order, the order defines the attack action encoding
+        neighbors, edges = borders_to_graph(borders)
+        self.neighbor_lists = tuple(tuple(neighbors[country.idx]) for country in countries)
+
+        self.adjacency = np.zeros((self.num_countries, self.num_countries), dtype=bool)
+        for idx, country_neighbors in enumerate(self.neighbor_lists):
+            self.adjacency[idx, list(country_neighbors)] = True
+
+        # every border once, in the orientation of the GameMap edges, sorted (the GNN edge index)
+        self.edge_list = sorted(edges)
+        self.edge_index = np.array(self.edge_list).T
+        self.n_edges = len(self.edge_list)
+
+        # bitboards, bit i stands for the country with idx i (see GameState.owner_masks)
+        self.neighbor_masks = tuple(sum(1 << idx for idx in neighbors) for neighbors in self.neighbor_lists)
+        self.continent_masks = tuple(sum(1 << int(idx) for idx in continent.country_idx) for continent in CONTINENTS)
+        self.continent_mask_of = [0] * self.num_countries
+        for continent_mask, continent in zip(self.continent_masks, CONTINENTS):
+            for idx in continent.country_idx:
+                self.continent_mask_of[idx] = continent_mask
+        self.continent_mask_of = tuple(self.continent_mask_of)
+        self.country_bit_shifts = np.arange(self.num_countries, dtype=np.uint64)
+
+        # attack actions: 3 (one per number of dice) per border of every country, plus a skip action
+        self.action_lookup_table = [
+            (country_idx, neighbor_idx, n_soldiers)
+            for country_idx, neighbors in enumerate(self.neighbor_lists)
+            for neighbor_idx in neighbors
+            for n_soldiers in range(1, 4)
+        ] + [(-1, -1, 0)] # skip action
+        self.total_attack_options_cnt = len(self.action_lookup_table)
+        self.action_table = ActionTable(self.action_lookup_table)
+
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+
+    def mask_to_array(self, mask: int) -> np.ndarray:
+        return ((np.uint64(mask) >> self.country_bit_shifts) & np.uint64(1)).astype(bool)
+
+_topology = None
+def get_topology() -> Topology:
+    global _topology
+    if _topology is None:
+        _topology = Topology()
+    return _topology
@@ -0,0 +1,280 @@
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, NamedTuple, Optional
+import multiprocessing as mp
+import numpy as np
+
+from risk.game import Game
+from risk.player_heuristic import PlayerHeuristic
+from risk.player_random import PlayerRandom
+
+ELO_SCALE = 400 / math.log(10)
+ELO_MEAN = 1500
+
+# a participant of a tournament: kind is 'heuristic', 'random' or 'rl', rl agents play with the
+# RiskGNN of checkpoint (a checkpoint of train_rl.save_model_checkpoint, None for an untrained model)
+class AgentSpec(NamedTuple):
+    name: str
+    kind: str
+    checkpoint: Optional[str] = None
+
+# one game of the schedule, seats are the agent names in seat order
+class TournamentGame(NamedTuple):
+    game_id: int
+    matchup: int
+    seats: tuple
+
+# models of the rl agents, loaded once per process
+_models = {}
+
+def load_agent_model(spec: AgentSpec):
+    if spec.name not in _models:
+        import torch
+        from risk.train_rl import make_model
+        torch.manual_seed(0) # untrained models are the same in every process
+        model = make_model('cpu')
+        if spec.checkpoint:
+            checkpoint = torch.load(spec.checkpoint, map_location='cpu')
+            model.load_state_dict(checkpoint['model_state_dict'])
+        model.eval()
+        _models[spec.name] = model
+    return _models[spec.name]
+
+def make_player(spec: AgentSpec, seat: int):
+    name = f"{spec.name} {seat + 1}"
+    match spec.kind:
+        case 'heuristic':
+            return PlayerHeuristic(name)
+        case 'random':
+            return PlayerRandom(name)
+        case 'rl':
+            from risk.player_rl import PlayerRL
+            return PlayerRL(name, load_agent_model(spec), 'cpu')
+    raise ValueError(f"unknown agent kind: {spec.kind}")
+
+# every matchup is a random set of players_per_game agents (all sets are used before any
+# repeats), played once with every cyclic rotation of the seats so that every agent of the
+# matchup plays from every seat. the games of a matchup share the seed of their random events
+def make_schedule(agent_names: List[str], players_per_game: int, num_matchups: int, seed: int) -> List[TournamentGame]:
+    rng = np.random.default_rng(seed)
+    combinations = list(itertools.combinations(agent_names, players_per_game))
+    matchups = []
+    while len(matchups) < num_matchups:
+        matchups.extend(combinations[i] for i in rng.permutation(len(combinations)))
+
+    schedule = []
+    for matchup_id, agents in enumerate(matchups[:num_matchups]):
+        agents = [agents[i] for i in rng.permutation(players_per_game)]
+        for rotation in range(players_per_game):
+            seats = tuple(agents[rotation:] + agents[:rotation])
+            schedule.append(TournamentGame(len(schedule), matchup_id, seats))
+    return schedule
+
+# places of the seats at the end of a game, 1 is best: the players left share the first place,
+# the others are placed in reverse order of elimination
+def final_places(game: Game) -> List[int]:
+    survivors = {player.pid for player in game.players}
+    eliminated = [player.pid for player in game.players_eliminated if player.pid not in survivors]
+    places = [1] * game.num_players_start
+    for order, pid in enumerate(reversed(eliminated)):
+        places[pid] = len(survivors) + 1 + order
+    return places
+
+def play_tournament_game(specs: dict, tournament_game: TournamentGame, seed: int, max_rounds: int) -> dict:
+    seed_sequence = np.random.SeedSequence(seed, spawn_key=(tournament_game.matchup,))
+    players = [make_player(specs[name], seat) for seat, name in enumerate(tournament_game.seats)]
+    if any(player.is_rl for player in players):
+        import torch
+        torch.manual_seed(int(seed_sequence.generate_state(1)[0]))
+
+    game = Game(players, display_map=False, log_all=False, eval_log=False, max_rounds=max_rounds, seed=seed_sequence, stop_without_rl=False)
+    game.gameplay_loop()
+    return {
+        'game_id': tournament_game.game_id,
+        'matchup': tournament_game.matchup,
+        'seats': list(tournament_game.seats),
+        'places': final_places(game),
+        'rounds': game.num_rounds_played,
+    }
+
+def init_worker():
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+# results of the finished games of an interrupted run, a partially written last line is removed
+def load_results(results_path) -> List[dict]:
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path, 'rb+') as f:
+        data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            f.truncate(len(complete))
+    return [json.loads(line) for line in complete.decode().splitlines() if line.strip()]
+
+# pairwise scores of a set of games: wins[i, j] is the score of agent i against agent j (every
+# better placed agent of a game wins against every worse placed one, shared places are draws
+# worth 1/2), games[i, j] the number of such pairings. returned per game, [num_games, k, k]
+def pairwise_results(results: List[dict], agent_names: List[str]):
+    index = {name: i for i, name in enumerate(agent_names)}
+    k = len(agent_names)
+    wins = np.zeros((len(results), k, k))
+    games = np.zeros((len(results), k, k))
+    for g, result in enumerate(results):
+        agents = [index[name] for name in result['seats']]
+        places = result['places']
+        for a, b in itertools.combinations(range(len(agents)), 2):
+            i, j = agents[a], agents[b]
+            games[g, i, j] += 1
+            games[g, j, i] += 1
+            if places[a] < places[b]:
+                wins[g, i, j] += 1
+            elif places[a] > places[b]:
+                wins[g, j, i] += 1
+            else:
+                wins[g, i, j] += 0.5
+                wins[g, j, i] += 0.5
+    return wins, games
+
+# Bradley-Terry maximum likelihood strengths (minorization-maximization iterations) on the Elo
+# scale with mean ELO_MEAN. prior adds a virtual draw between every pair of agents, which keeps
+# the ratings finite for agents that won or lost all their games
+def bradley_terry_elo(wins: np.ndarray, games: np.ndarray, prior: float = 1.0, iterations: int = 10_000, tol: float = 1e-10) -> np.ndarray:
+    off_diagonal = 1 - np.eye(len(wins))
+    wins = wins + prior / 2 * off_diagonal
+    games = games + prior * off_diagonal
+    total_wins = wins.sum(axis=1)
+
+    log_strength = np.zeros(len(wins))
+    for _ in range(iterations):
+        strength = np.exp(log_strength)
+        expected = (games / (strength[:, None] + strength[None, :])).sum(axis=1)
+        new_log_strength = np.log(total_wins / expected)
+        new_log_strength -= new_log_strength.mean()
+        converged = np.max(np.abs(new_log_strength - log_strength)) < tol
+        log_strength = new_log_strength
+        if converged:
+            break
+    return ELO_MEAN + ELO_SCALE * log_strength
+
+# Elo ratings with bootstrap confidence intervals (games resampled with replacement, so the
+# correlated pairings of one game stay together), plus games played, first places (shared
+# with the other players left when the round limit is reached) and mean place per agent
+def compute_ratings(results: List[dict], agent_names: List[str], num_bootstrap: int = 200, confidence: float = 0.95, seed: int = 0) -> dict:
+    wins, games = pairwise_results(results, agent_names)
+    elo = bradley_terry_elo(wins.sum(axis=0), games.sum(axis=0))
+
+    rng = np.random.default_rng(seed)
+    bootstrap = np.zeros((num_bootstrap, len(agent_names)))
+    for b in range(num_bootstrap):
+        counts = np.bincount(rng.integers(len(results), size=len(results)), minlength=len(results))
+        bootstrap[b] = bradley_terry_elo(np.tensordot(counts, wins, axes=1), np.tensordot(counts, games, axes=1))
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(bootstrap, [alpha, 1 - alpha], axis=0) if len(results) else (elo, elo)
+
+    ratings = {}
+    for i, name in enumerate(agent_names):
+        places = [result['places'][seat] for result in results for seat, seat_name in enumerate(result['seats']) if seat_name == name]
+        ratings[name] = {
+            'elo': float(elo[i]),
+            'ci_low': float(low[i]),
+            'ci_high': float(high[i]),
+            'games': len(places),
+            'first_places': sum(1 for place in places if place == 1),
+            'mean_place': float(np.mean(places)) if places else None,
+        }
+    return ratings
+
+def format_ratings(ratings: dict, confidence: float = 0.95) -> str:
+    ci_header = f"{confidence:.0%} ci"
+    lines = [f"{'agent':<24} {'elo':>7} {ci_header:>14} {'games':>6} {'first':>6} {'mean place':>11}"]
+    for name, r in sorted(ratings.items(), key=lambda item: -item[1]['elo']):
+        ci = f"[{r['ci_low']:.0f}, {r['ci_high']:.0f}]"
+        mean_place = f"{r['mean_place']:.2f}" if r['mean_place'] is not None else '-'
+        lines.append(f"{name:<24} {r['elo']:7.0f} {ci:>14} {r['games']:6d} {r['first_places']:6d} {mean_place:>11}")
+    return '\n'.join(lines)
+
+# plays the seat-rotated schedule (see make_schedule) of num_matchups matchups of
+# players_per_game agents (all agents, at most 6, by default) on num_workers processes
+# (0: in this process) and returns the ratings of the agents (see compute_ratings).
+# every finished game is appended to the jsonl file results_path right away, a run with the
+# same arguments and results_path only plays the games that are not in the file yet
+def run_tournament(agents: List[AgentSpec], results_path, num_matchups=20, players_per_game=None, num_workers=0, seed=0, max_rounds=75, num_bootstrap=200):
+    specs = {agent.name: agent for agent in agents}
+    assert len(specs) == len(agents), "agent names must be unique"
+    agent_names = [agent.name for agent in agents]
+    players_per_game = players_per_game or min(len(agents), 6)
+    assert 2 <= players_per_game <= min(len(agents), 6)
+
+    schedule = make_schedule(agent_names, players_per_game, num_matchups, seed)
+    results = load_results(results_path)
+    for result in results:
+        scheduled = schedule[result['game_id']] if result['game_id'] < len(schedule) else None
+        if scheduled is None or list(scheduled.seats) != result['seats']:
+            raise ValueError(f"{results_path} has results of a different tournament (game {result['game_id']})")
+    done = {result['game_id'] for result in results}
+    pending = [tournament_game for tournament_game in schedule if tournament_game.game_id not in done]
+    logging.info(f"Tournament of {len(agents)} agents: {len(schedule)} games, {len(done)} already played")
+
+    os.makedirs(os.path.dirname(results_path) or '.', exist_ok=True)
+    failed = []
+    with open(results_path, 'a') as f:
+        def save(result):
+            results.append(result)
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+
+        if num_workers > 0:
+            with ProcessPoolExecutor(num_workers, mp_context=mp.get_context('spawn'), initializer=init_worker) as executor:
+                futures = {executor.submit(play_tournament_game, specs, g, seed, max_rounds): g for g in pending}
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception:
+                        logging.exception(f"Tournament game {futures[future].game_id} failed")
+                        failed.append(futures[future].game_id)
+                        continue
+                    save(result)
+        else:
+            for tournament_game in pending:
+                save(play_tournament_game(specs, tournament_game, seed, max_rounds))
+
+    # the games that finished are saved, a run with the same arguments retries the failed ones
+    if failed:
+        raise RuntimeError(f"{len(failed)} tournament games failed (game ids {sorted(failed)}), the results of the other games are in {results_path}")
+
+    results.sort(key=lambda result: result['game_id'])
+    return compute_ratings(results, agent_names, num_bootstrap=num_bootstrap, seed=seed)
+
+# 'heuristic', 'random' or the path of a checkpoint
+def parse_agent(arg: str) -> AgentSpec:
+    if arg in ('heuristic', 'random'):
+        return AgentSpec(arg, arg)
+    return AgentSpec(os.path.splitext(os.path.basename(arg))[0], 'rl', arg)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m risk.tournament', description="Seat rotated tournament with Elo ratings")
+    parser.add_argument('agents', nargs='+', help="'heuristic', 'random' or a model checkpoint path")
+    parser.add_argument('--results', default='risk/eval_results/tournament.jsonl', help="jsonl file of the game results, resumed if it exists")
+    parser.add_argument('--matchups', type=int, default=20)
+    parser.add_argument('--players-per-game', type=int)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-rounds', type=int, default=75)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    agents = [parse_agent(arg) for arg in args.agents]
+    ratings = run_tournament(agents, args.results, args.matchups, args.players_per_game, args.workers, args.seed, args.max_rounds)
+    print(format_ratings(ratings))
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
-from risk.game import Game
 from risk.player_heuristic import PlayerHeuristic
 from risk.player_rl import PlayerRL, RiskGNN
 from risk.player_random import PlayerRandom
+from risk.vec_game import VecGame
+from risk.self_play import SelfPlayPool, collect_experiences
+from risk.experience_shards import ShardWriter, ShardDataset
+from risk.game_stats import GameStats
+from risk.sequential_test import SPRT
 import risk.logging_setup as logging_setup
 import logging
 import torch.optim as optim
@@ -11,6 +15,9 @@ from tqdm import tqdm
 import torch.nn.utils
 import torch.optim.lr_scheduler 
 import pickle
+import time
+import functools
+import numpy as np
 from datetime import datetime
 
 def dump_eval_results(eval_results, episode, name='heuristic'):
@@ -34,48 +41,89 @@ def load_model_checkpoint(filepath, model, optimizer, device):
     episode = checkpoint['episode']
     return model, optimizer, episode
 
-# evaluate model against stronger opponentes
-def eval_model(model, device, n_episode, num_games=100):
+def make_eval_players(model, device):
+    # tweak this, try different configurations
+    return [
+            PlayerHeuristic("Player Heuristic 1"),
+            PlayerRL("Player RL 2", model, device),
+            PlayerRandom("Player Random 3"),
+            PlayerRandom("Player Random 4"),
+            PlayerRandom("Player Random 5"),
+        ]
+
+def make_training_players(model, device, features_dtype=np.float32):
+    # tweak this, try different configurations, should we use majority RL players?
+    # was using only random opponents, that way the game ends in tie too often
+    return [
+        PlayerRandom("Player Random 1"),
+        PlayerRandom("Player Random 2"),
+        PlayerRL("Player RL 3", model, device, features_dtype),
+        PlayerRL("Player RL 4", model, device, features_dtype),
+        PlayerHeuristic("Player Heuristic 5"),
+    ]
+
+# evaluate model against stronger opponentes,
+# num_envs games are played in lockstep with batched model forward passes.
+# with stats the timings and counters of the games are logged (see GameStats).
+# with win_rate_threshold the evaluation stops early once a sequential test (see SPRT) decides
+# whether the win rate is above or below the threshold (+- indifference), num_games is then
+# the maximum number of games. the games are played in batches of num_envs and the test is
+# checked after every complete batch, since the games that finish first tend to be the short ones
+def eval_model(model, device, n_episode, num_games=100, num_envs=32, stats=False, win_rate_threshold=None, indifference=0.05, alpha=0.05, beta=0.05):
     logging.info(f"Evaluating model after {n_episode} training episodes")
 
     num_rounds_ls = [] # to get distribution of game duration
     game_wins = [] # RL won/lost game int bool (0, 1)
     game_tied = [] # Game ended in tie int bool (0, 1) 
     
-    for _ in tqdm(range(num_games), desc="Evaluating RL model"):
-        # tweak this, try different configurations
-        players = [
-                PlayerHeuristic("Player Heuristic 1"),
-                PlayerRL("Player RL 2", model, device),
-                PlayerRandom("Player Random 3"),
-                PlayerRandom("Player Random 4"),
-                PlayerRandom("Player Random 5"),
-            ]
-        
-        game = Game(players, display_map=False, log_all=False, eval_log=True)
-        num_rounds_game, rl_won, game_tie = game.gameplay_loop()
-        
-        num_rounds_ls.append(num_rounds_game)
-        game_wins.append(rl_won)
-        game_tied.append(game_tie)
-        game_wins.append(rl_won)
+    eval_stats = GameStats()
+    sprt = SPRT.around(win_rate_threshold, indifference, alpha, beta) if win_rate_threshold is not None else None
+    batch_size = num_envs if sprt else num_games
+    num_played = 0
+    vec_game = VecGame(lambda: make_eval_players(model, device), num_envs, display_map=False, log_all=False, eval_log=True, stats=stats)
+    progress = tqdm(total=num_games, desc="Evaluating RL model")
+    while num_played < num_games and not (sprt and sprt.decision):
+        batch = min(batch_size, num_games - num_played)
+        for game, (num_rounds_game, rl_won, game_tie) in vec_game.play(batch):
+            if stats:
+                eval_stats.merge(game.stats)
+            if sprt:
+                sprt.update(rl_won)
+            num_rounds_ls.append(num_rounds_game)
+            game_wins.append(rl_won)
+            game_tied.append(game_tie)
+            progress.update()
+        num_played += batch
+    progress.close()
     
-    logging.info(f"Current Eval tie rate after {n_episode} training episodes: {round(sum(game_tied)/num_games, 4)}")
-    logging.info(f"Current Eval win rate after {n_episode} training episodes: {round(sum(game_wins)/num_games, 4)}")
+    logging.info(f"Current Eval tie rate after {n_episode} training episodes: {round(sum(game_tied)/num_played, 4)}")
+    logging.info(f"Current Eval win rate after {n_episode} training episodes: {round(sum(game_wins)/num_played, 4)}")
+    if sprt:
+        low, high = sprt.confidence_interval()
+        outcome = f"{sprt.decision} {win_rate_threshold}" if sprt.decision else f"undecided around {win_rate_threshold}"
+        logging.info(f"Sequential eval after {n_episode} training episodes: win rate {outcome} after {num_played} of at most {num_games} games, "
+                     f"win rate {sprt.win_rate:.4f}, 95% CI [{low:.4f}, {high:.4f}]")
+    if stats:
+        logging.info(f"Eval {eval_stats.summary()}")
     
     return num_rounds_ls, game_wins, game_tied
 
     
-def train(num_episodes=20_000, eval_interval=1000, checkpoint_path=None):
+# with num_envs > 1 the episodes are played in lockstep (see risk.vec_game), and the model
+# is trained on each episode as soon as it finishes while the other episodes continue.
+# with num_workers > 0 the episodes are played by a pool of self-play processes (see risk.self_play)
+# with shard_dir every training episode is also written to experience shards (see risk.experience_shards)
+# with stats the timings and counters of the training games and the time of the model updates
+# are logged at every evaluation, and the evaluations log theirs (see GameStats)
+# with eval_win_rate_threshold the evaluations stop early once their outcome is clear, see eval_model
+# features_dtype is the dtype of the node features in the experiences (and shards) of the
+# training games, np.float16 halves their memory, the model still trains in float32
+def train(num_episodes=20_000, eval_interval=1000, checkpoint_path=None, num_envs=1, num_workers=0, minibatch_size=None, shard_dir=None, stats=False, eval_win_rate_threshold=None, features_dtype=np.float32):
     logging_setup.init_logging(name='rl_training_new_rewards_latest_heuristic_log')
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     logging.info(f"Running torch on device: {device}")
     
-    model = RiskGNN(
-            in_channels_node=14, # number of features in node embeddings 
-            hidden_dim=64, 
-            num_actions=493 # number of possible attacks
-        ).to(device)
+    model = make_model(device)
     optimizer = optim.Adam(model.parameters(), lr=5e-5) # TODO Tune lr
     
     start_episode = 0
@@ -88,61 +136,122 @@ def train(num_episodes=20_000, eval_interval=1000, checkpoint_path=None):
     eval_results = []
 
     # eval initial untrained model
-    eval_results.append(eval_model(model, device, n_episode=0))
+    eval_results.append(eval_model(model, device, n_episode=0, stats=stats, win_rate_threshold=eval_win_rate_threshold))
     dump_eval_results(eval_results, start_episode)
     
-    for i in tqdm(range(num_episodes), desc="Training RL model"):
-        # tweak this, try different configurations, should we use majority RL players?
-        # was using only random opponents, that way the game ends in tie too often
-        players = [
-            PlayerRandom("Player Random 1"),
-            PlayerRandom("Player Random 2"),
-            PlayerRL("Player RL 3", model, device),
-            PlayerRL("Player RL 4", model, device),
-            PlayerHeuristic("Player Heuristic 5"),
-        ]
-        
-        game = Game(players, display_map=False, log_all=False, eval_log=False)
-        game.gameplay_loop()
-                    
-        all_experiences = []
-        # note that at end of game, the eliminated list includes all players, including winner
-        for player in game.players_eliminated: 
-            if isinstance(player, PlayerRL):
-                all_experiences.extend(player.experiences)
-        
-        train_model(model, optimizer, all_experiences, game.action_lookup_table, device)
+    shard_writer = ShardWriter(shard_dir) if shard_dir else None
+    training_stats = GameStats() if stats else None
+    pool = None
+    if num_workers > 0:
+        make_players = functools.partial(make_training_players, features_dtype=features_dtype)
+        pool = SelfPlayPool(model, make_players, num_workers, num_envs=num_envs, stats=stats)
+        episodes = pool.episodes(num_episodes, training_stats)
+    else:
+        vec_game = VecGame(lambda: make_training_players(model, device, features_dtype), num_envs, display_map=False, log_all=False, eval_log=False, stats=stats)
+        def play_episodes():
+            for game, _ in vec_game.play(num_episodes):
+                if stats:
+                    training_stats.merge(game.stats)
+                yield collect_experiences(game)
+        episodes = play_episodes()
+
+    try:
+        for i, all_experiences in enumerate(tqdm(episodes, total=num_episodes, desc="Training RL model")):
+            start = time.perf_counter()
+            train_model(model, optimizer, all_experiences, device, minibatch_size)
+            if stats:
+                training_stats.add_time('train_model', time.perf_counter() - start)
+            if shard_writer:
+                shard_writer.append(all_experiences)
+            if pool:
+                pool.publish(model)
         
-        if (i + 1) % eval_interval == 0:
-            eval_results.append(eval_model(model, device, n_episode=i+1))
-            if (i + 1) != num_episodes:
-                dump_eval_results(eval_results, i + 1 + start_episode)
+            if (i + 1) % eval_interval == 0:
+                if stats:
+                    logging.info(f"Training {training_stats.summary()}")
+                eval_results.append(eval_model(model, device, n_episode=i+1, stats=stats, win_rate_threshold=eval_win_rate_threshold))
+                if (i + 1) != num_episodes:
+                    dump_eval_results(eval_results, i + 1 + start_episode)
         
-        if (i + 1) % 1000 == 0 and (i + 1) != num_episodes:
-            save_model_checkpoint(model, optimizer, i + 1 + start_episode)
+            if (i + 1) % 1000 == 0 and (i + 1) != num_episodes:
+                save_model_checkpoint(model, optimizer, i + 1 + start_episode)
     
+    finally:
+        # the workers are stopped also when training fails
+        if pool:
+            pool.close()
+
     save_model_checkpoint(model, optimizer, num_episodes + start_episode)
     dump_eval_results(eval_results, num_episodes + start_episode)
 
-def train_model(model, optimizer, experiences, action_lookup_table, device):
-    states = []
-    edge_indices = []
-    valid_action_masks = []
-    action_indices = []
-    rewards = []
-    
-    for exp in experiences:
-        states.append(exp['node_features'].to(device))
-        edge_indices.append(exp['edge_index'].to(device))
-        valid_action_masks.append(exp['valid_action_mask'].to(device))
-        action_indices.append(exp['action_idx'])
-        rewards.append(exp['reward'])
-    
-    rewards = compute_discounted_rewards(rewards, gamma=0.99)
-    loss = compute_policy_loss(model, states, edge_indices, valid_action_masks, action_indices, rewards, action_lookup_table)
+def make_model(device):
+    return RiskGNN(
+            in_channels_node=14, # number of features in node embeddings 
+            hidden_dim=64, 
+            num_actions=493 # number of possible attacks
+        ).to(device)
+
+# plays num_games training games with the current model (or the one of the checkpoint)
+# and writes their experiences to shards, without training
+def generate_experience_shards(shard_dir, num_games, num_envs=32, checkpoint_path=None):
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = make_model(device)
+    if checkpoint_path:
+        model, _, _ = load_model_checkpoint(checkpoint_path, model, optim.Adam(model.parameters()), device)
+
+    shard_writer = ShardWriter(shard_dir)
+    vec_game = VecGame(lambda: make_training_players(model, device), num_envs, display_map=False, log_all=False, eval_log=False)
+    for game, _ in tqdm(vec_game.play(num_games), total=num_games, desc="Generating experiences"):
+        shard_writer.append(collect_experiences(game))
+
+# trains on the experiences of the shards in shard_dir, in random minibatches read from
+# the memory mapped shards. the discounted returns are normalized per minibatch
+def train_from_shards(shard_dir, num_epochs=1, minibatch_size=1024, checkpoint_path=None):
+    logging_setup.init_logging(name='rl_training_from_shards_log')
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = make_model(device)
+    optimizer = optim.Adam(model.parameters(), lr=5e-5)
+    start_episode = 0
+    if checkpoint_path:
+        model, optimizer, start_episode = load_model_checkpoint(checkpoint_path, model, optimizer, device)
+
+    dataset = ShardDataset(shard_dir)
+    logging.info(f"Training on {dataset.num_steps} steps of {dataset.num_episodes} episodes from {shard_dir}")
+    for epoch in range(num_epochs):
+        num_minibatches = -(-len(dataset) // minibatch_size)
+        for batch in tqdm(dataset.minibatches(minibatch_size, device), total=num_minibatches, desc=f"Epoch {epoch + 1}"):
+            returns = batch['return'].float()
+            normalized_returns = (returns - returns.mean()) / (returns.std() + 1e-8)
+            loss = compute_policy_loss(model, batch['node_features'], batch['valid_action_mask'], batch['action_idx'], normalized_returns)
+
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
+            optimizer.step()
+
+    save_model_checkpoint(model, optimizer, start_episode + dataset.num_episodes * num_epochs)
+    return model
+
+# all experiences of the episode (a RolloutBuffer) go through the model in one batched forward,
+# with minibatch_size the gradients are accumulated over minibatches of that many experiences,
+# which bounds the memory of the autograd graph for long episodes
+def train_model(model, optimizer, experiences, device, minibatch_size=None):
+    if len(experiences) == 0:
+        return
+
+    batch = experiences.tensors(device)
+    states = batch['node_features']
+    valid_action_masks = batch['valid_action_mask']
+    action_indices = batch['action_idx']
+    rewards = compute_discounted_rewards(experiences.arrays['reward'][:len(experiences)].tolist(), gamma=0.99)
+    normalized_rewards = normalize_rewards(rewards, device)
     
     optimizer.zero_grad()
-    loss.backward()
+    minibatch_size = minibatch_size or len(experiences)
+    for start in range(0, len(experiences), minibatch_size):
+        end = start + minibatch_size
+        loss = compute_policy_loss(model, states[start:end], valid_action_masks[start:end], action_indices[start:end], normalized_rewards[start:end])
+        loss.backward()
     torch.nn.utils.clip_grad_norm_(model.parameters(), max_norm=1.0)
     optimizer.step()
 
@@ -154,23 +263,18 @@ def compute_discounted_rewards(rewards, gamma):
         discounted_rewards.insert(0, R)
     return discounted_rewards
 
-def compute_policy_loss(model, states, edge_indices, valid_action_masks, action_indices, rewards, action_lookup_table):
-    total_loss = 0.0
-    device = states[0].device
-    edge_index = edge_indices[0] 
-    
+# normalized over the whole episode, also when the loss is computed in minibatches
+def normalize_rewards(rewards, device):
     rewards_tensor = torch.tensor(rewards, dtype=torch.float, device=device)
-    normalized_rewards = (rewards_tensor - rewards_tensor.mean()) / (rewards_tensor.std() + 1e-8)
-    
-    for state, valid_mask, action_idx, reward in zip(states, valid_action_masks, action_indices, normalized_rewards):
-        logits = model(state, edge_index, action_lookup_table)
-        
-        masked_logits = logits.clone()
-        masked_logits[~valid_mask] = float('-inf')
-    
-        probs = F.softmax(masked_logits, dim=0)
-        selected_prob = probs[action_idx]
-        log_prob = torch.log(selected_prob + 1e-8)
-        total_loss += -log_prob * reward # policy gradient ascent update
-    
-    return total_loss
+    return (rewards_tensor - rewards_tensor.mean()) / (rewards_tensor.std() + 1e-8)
+
+# states: [batch_size, num_nodes, n_features], valid_action_masks: [batch_size, num_actions],
+# action_indices and normalized_rewards: [batch_size]
+def compute_policy_loss(model, states, valid_action_masks, action_indices, normalized_rewards):
+    logits = model(states) # [batch_size, num_actions]
+    masked_logits = logits.masked_fill(~valid_action_masks, float('-inf'))
+
+    probs = F.softmax(masked_logits, dim=-1)
+    selected_probs = probs.gather(1, action_indices.unsqueeze(1)).squeeze(1)
+    log_probs = torch.log(selected_probs + 1e-8)
+    return (-log_probs * normalized_rewards).sum() # policy gradient ascent update
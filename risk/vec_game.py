@@ -0,0 +1,68 @@
+from typing import Callable, List
+import numpy as np
+from risk.game import Game
+from risk.player import Player
+
+# plays many independent games in lockstep: every game is advanced until its next
+# RL decision, then the pending decisions of all games are answered with one batched
+# forward pass per model instead of one forward pass per decision.
+# every game gets its own seed spawned from seed (int or np.random.SeedSequence), so the
+# random events of the games are reproducible and independent of each other
+class VecGame:
+    def __init__(self, make_players: Callable[[], List[Player]], num_envs: int, seed=None, **game_kwargs):
+        self.make_players = make_players
+        self.num_envs = num_envs
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.game_kwargs = game_kwargs
+
+    # generator of (game, result) for num_games games in the order they finish,
+    # result being the return value of Game.gameplay_loop
+    def play(self, num_games: int):
+        envs = [] # (game, steps, pending decision)
+        num_started = 0
+
+        while num_started < num_games or envs:
+            while num_started < num_games and len(envs) < self.num_envs:
+                game = Game(self.make_players(), seed=self.seed_sequence.spawn(1)[0], **self.game_kwargs)
+                steps = game.gameplay_steps()
+                num_started += 1
+                finished = self.advance(envs, game, steps, None)
+                if finished is not None:
+                    yield finished
+
+            if not envs:
+                continue
+            answers = self.select_actions([decision for _, _, decision in envs])
+            pending, envs = envs, []
+            for (game, steps, _), answer in zip(pending, answers):
+                finished = self.advance(envs, game, steps, answer)
+                if finished is not None:
+                    yield finished
+
+    # runs the game until its next decision, returns (game, result) if the game ended instead
+    @staticmethod
+    def advance(envs, game, steps, answer):
+        try:
+            decision = next(steps) if answer is None else steps.send(answer)
+        except StopIteration as stop:
+            return game, stop.value
+
+        envs.append((game, steps, decision))
+        return None
+
+    # groups the decisions by model, so that players with different models can share the environment
+    @staticmethod
+    def select_actions(decisions):
+        from risk.player_rl import select_attack_actions # torch is only imported once there are RL decisions
+        answers = [None] * len(decisions)
+        groups = {}
+        for i, decision in enumerate(decisions):
+            groups.setdefault(id(decision.player.model), []).append(i)
+
+        for indices in groups.values():
+            player = decisions[indices[0]].player
+            group_answers = select_attack_actions(player.model, player.device, [decisions[i] for i in indices])
+            for i, answer in zip(indices, group_answers):
+                answers[i] = answer
+
+        return answers
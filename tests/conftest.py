@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+# fraction of n simulated full attacks (attacking until conquest or until all attackers are
+# lost) that conquer, rolling real dice: min(3, attackers) against min(2, defenders) per exchange
+def simulate_conquests(attackers: int, defenders: int, n: int, rng: np.random.Generator) -> float:
+    a = np.full(n, attackers)
+    d = np.full(n, defenders)
+    while True:
+        active = (a > 0) & (d > 0)
+        if not active.any():
+            return float((d == 0).mean())
+        n_attack = np.minimum(3, a)
+        n_defend = np.minimum(2, d)
+        attack_rolls = -np.sort(-np.where(np.arange(3) < n_attack[:, None], rng.integers(1, 7, (n, 3)), 0), axis=1)
+        defend_rolls = -np.sort(-np.where(np.arange(2) < n_defend[:, None], rng.integers(1, 7, (n, 2)), 0), axis=1)
+        for k in range(2):
+            compared = active & (k < n_attack) & (k < n_defend)
+            a -= compared & (attack_rolls[:, k] <= defend_rolls[:, k])
+            d -= compared & (attack_rolls[:, k] > defend_rolls[:, k])
+
+@pytest.fixture
+def simulate():
+    return simulate_conquests
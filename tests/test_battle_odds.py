@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from risk.battle_odds import conquest_probability, expected_remaining_troops
+
+@pytest.mark.parametrize('attackers, defenders', [(1, 1), (5, 3), (10, 10), (3, 5), (30, 20), (64, 64)])
+def test_conquest_probability_matches_simulation(attackers, defenders, simulate):
+    simulated = simulate(attackers, defenders, 20_000, np.random.default_rng(attackers * 1000 + defenders))
+    assert conquest_probability(attackers, defenders) == pytest.approx(simulated, abs=0.015)
+
+# beyond max_armies (64) the armies are scaled down, which underestimates the stronger side
+def test_conquest_probability_beyond_max_armies(simulate):
+    simulated = simulate(100, 80, 20_000, np.random.default_rng(0))
+    assert conquest_probability(100, 80) == pytest.approx(0.960, abs=0.001)
+    assert simulated == pytest.approx(0.986, abs=0.005)
+
+def test_vectorized_lookups_match_scalar_ones():
+    attackers = np.array([0, 1, 5, 40, 100])
+    defenders = np.array([3, 1, 8, 2, 80])
+    probabilities = conquest_probability(attackers, defenders)
+    attackers_left, defenders_left = expected_remaining_troops(attackers, defenders)
+    for i, (a, d) in enumerate(zip(attackers.tolist(), defenders.tolist())):
+        assert probabilities[i] == pytest.approx(conquest_probability(a, d))
+        assert attackers_left[i] == pytest.approx(expected_remaining_troops(a, d)[0])
+        assert defenders_left[i] == pytest.approx(expected_remaining_troops(a, d)[1])
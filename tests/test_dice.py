@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from risk.dice import EXCHANGE_TABLE, RandomStream, exchange_distribution, get_battle_outcome_table, sample_exchange
+
+def test_exchange_counts_3_against_2():
+    counts = {losses: round(p * 6 ** 5) for losses, p in exchange_distribution(3, 2).items()}
+    assert counts == {(0, 2): 2890, (1, 1): 2611, (2, 0): 2275}
+
+def test_exchange_1_against_1():
+    assert exchange_distribution(1, 1) == pytest.approx({(0, 1): 15 / 36, (1, 0): 21 / 36})
+
+def test_exchange_table_is_cumulative():
+    for n_attack in range(1, 4):
+        for n_defend in range(1, 3):
+            losses, cumulative_probs = EXCHANGE_TABLE[n_attack][n_defend]
+            assert all(a + d == min(n_attack, n_defend) for a, d in losses)
+            assert cumulative_probs[-1] == pytest.approx(1.0)
+
+def test_sample_exchange_frequencies():
+    stream = RandomStream(np.random.default_rng(0))
+    samples = [sample_exchange(3, 2, stream) for _ in range(20_000)]
+    for losses, p in exchange_distribution(3, 2).items():
+        assert samples.count(losses) / len(samples) == pytest.approx(p, abs=0.015)
+
+def test_outcome_table_distributions():
+    table = get_battle_outcome_table()
+    assert np.allclose(table.probs[1:, 1:].sum(axis=2), 1.0)
+    # a single exchange decides 1 against 1
+    assert table.probs[1, 1, 1] == pytest.approx(15 / 36)
+
+@pytest.mark.parametrize('attackers, defenders', [(5, 3), (10, 10), (3, 5), (100, 80)])
+def test_outcome_table_samples_match_simulation(attackers, defenders, simulate):
+    # 100 against 80 is beyond max_armies, it is sampled exchange by exchange until it fits
+    table = get_battle_outcome_table()
+    stream = RandomStream(np.random.default_rng(1))
+    sampled = np.mean([table.sample(attackers, defenders, stream)[1] == 0 for _ in range(20_000)])
+    assert sampled == pytest.approx(simulate(attackers, defenders, 20_000, np.random.default_rng(2)), abs=0.015)
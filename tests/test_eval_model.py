@@ -0,0 +1,16 @@
+import logging
+import re
+import torch
+
+from risk.train_rl import eval_model, make_model
+
+def test_eval_win_rate_matches_sequential_test(caplog):
+    caplog.set_level(logging.INFO)
+    torch.manual_seed(0)
+    num_rounds, game_wins, game_tied = eval_model(make_model('cpu'), 'cpu', n_episode=0, num_games=8, num_envs=4, win_rate_threshold=0.3)
+
+    assert len(game_wins) == len(game_tied) == len(num_rounds)
+    win_rate = float(re.search(r"Current Eval win rate .*: ([\d.]+)", caplog.text).group(1))
+    sprt_win_rate = float(re.search(r"Sequential eval .* win rate ([\d.]+), 95% CI", caplog.text).group(1))
+    assert win_rate == round(sum(game_wins) / len(game_wins), 4)
+    assert abs(win_rate - sprt_win_rate) < 1e-4
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pytest
+
+from risk.experience_shards import ShardDataset, ShardWriter, discounted_returns, list_shards
+from risk.rollout_buffer import RolloutBuffer
+
+def make_episode(num_steps, rng, episode):
+    buffer = RolloutBuffer(features_dtype=np.float16)
+    for _ in range(num_steps):
+        buffer.add(rng.normal(size=(42, 14)), rng.random(493) < 0.3, int(rng.integers(493)), float(rng.normal()), float(rng.normal()), episode=episode)
+    return buffer
+
+def read_all(directory):
+    dataset = ShardDataset(directory)
+    return dataset, dataset.get_batch(np.arange(len(dataset)))
+
+def test_write_read_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    episodes = [make_episode(num_steps, rng, episode) for episode, num_steps in enumerate([5, 3, 6])]
+    writer = ShardWriter(str(tmp_path), max_steps_per_shard=8, gamma=0.9)
+    for episode in episodes:
+        writer.append(episode)
+    assert len(list_shards(str(tmp_path))) == 2
+
+    dataset, batch = read_all(str(tmp_path))
+    assert dataset.num_episodes == 3 and len(dataset) == 14
+    expected = RolloutBuffer.concatenate(episodes)
+    tensors = expected.tensors()
+    for name in ('node_features', 'valid_action_mask', 'action_idx', 'reward', 'episode'):
+        assert np.array_equal(batch[name].numpy(), tensors[name].numpy()), name
+    returns = np.concatenate([discounted_returns(episode.arrays['reward'][:len(episode)], 0.9) for episode in episodes])
+    assert batch['return'].numpy() == pytest.approx(returns)
+
+# a writer interrupted before the meta.json of its new shard leaves an incomplete directory
+def test_writer_after_an_interrupted_writer(tmp_path):
+    rng = np.random.default_rng(1)
+    ShardWriter(str(tmp_path)).append(make_episode(4, rng, 0))
+    os.makedirs(tmp_path / 'shard_00001')
+
+    writer = ShardWriter(str(tmp_path))
+    writer.append(make_episode(2, rng, 1))
+    assert writer.shard_dir.endswith('shard_00002')
+
+    dataset, batch = read_all(str(tmp_path))
+    assert dataset.num_episodes == 2 and len(dataset) == 6
+    assert batch['episode'].tolist() == [0] * 4 + [1] * 2
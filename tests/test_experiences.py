@@ -0,0 +1,17 @@
+import numpy as np
+import torch
+
+from risk.self_play import collect_experiences
+from risk.train_rl import make_model, make_training_players, train_model
+from risk.vec_game import VecGame
+
+def test_training_experiences_in_float16():
+    torch.manual_seed(0)
+    model = make_model('cpu')
+    vec_game = VecGame(lambda: make_training_players(model, 'cpu', np.float16), 2, seed=0, display_map=False, log_all=False, eval_log=False)
+    for game, _ in vec_game.play(2):
+        experiences = collect_experiences(game)
+        assert len(experiences) > 0
+        assert experiences.arrays['node_features'].dtype == np.float16
+        assert experiences.tensors()['node_features'].dtype == torch.float32
+        train_model(model, torch.optim.Adam(model.parameters()), experiences, 'cpu')
@@ -0,0 +1,48 @@
+import numpy as np
+
+from risk.game import Game
+from risk.player_heuristic import PlayerHeuristic
+
+def test_clone_does_not_draw_on_the_original_map():
+    game = Game([PlayerHeuristic(f"Player Heuristic {i}") for i in range(1, 4)], log_all=False, seed=0, stop_without_rl=False, max_rounds=5)
+    clone = game.clone()
+    assert not clone.display_map and clone.renderer is None
+
+    clone.gameplay_loop()
+    assert not np.array_equal(clone.state.troops, game.state.troops)
+    assert np.array_equal(game.renderer.drawn_troops, game.state.troops)
+    game.renderer.close()
+
+def test_owner_masks_match_the_initial_assignment():
+    game = Game([PlayerHeuristic(f"Player Heuristic {i}") for i in range(1, 6)], display_map=False, log_all=False, seed=1)
+    for pid in range(5):
+        countries = np.flatnonzero(game.state.owners == pid)
+        assert game.state.owner_masks[pid] == sum(1 << int(idx) for idx in countries)
+
+class CountingGame(Game):
+    decision_calls = 0
+
+    def assign_soldiers(self, *args):
+        self.decision_calls += 1
+        return super().assign_soldiers(*args)
+
+    def attack(self, *args):
+        self.decision_calls += 1
+        return super().attack(*args)
+
+    def blitz(self, *args):
+        self.decision_calls += 1
+        return super().blitz(*args)
+
+    def fortify(self, *args):
+        self.decision_calls += 1
+        return super().fortify(*args)
+
+    def trade_in_cards(self, *args):
+        self.decision_calls += 1
+        return super().trade_in_cards(*args)
+
+def test_stats_count_the_decisions():
+    game = CountingGame([PlayerHeuristic(f"Player Heuristic {i}") for i in range(1, 5)], display_map=False, log_all=False, seed=2, stats=True, stop_without_rl=False, max_rounds=20)
+    game.gameplay_loop()
+    assert game.stats.counters['decisions'] == game.decision_calls > 0
@@ -0,0 +1,68 @@
+import logging
+import numpy as np
+
+from risk.game import Game
+from risk.game_record import GameRecord
+from risk.player_heuristic import PlayerHeuristic
+
+def make_players():
+    return [PlayerHeuristic(f"Player Heuristic {i}") for i in range(1, 5)]
+
+def play(seed, log_all=False):
+    game = Game(make_players(), display_map=False, log_all=log_all, seed=seed, record=True, stop_without_rl=False, max_rounds=20)
+    game.gameplay_loop()
+    return game
+
+def assert_replays(game):
+    record = GameRecord.from_bytes(game.record.to_bytes())
+    assert record.seed == game.record.seed
+    replayed = Game.replay(record)
+    assert np.array_equal(replayed.state.owners, game.state.owners)
+    assert np.array_equal(replayed.state.troops, game.state.troops)
+
+def test_replay_unseeded_record():
+    game = play(None)
+    assert game.record.seed is None
+    assert_replays(game)
+
+def test_replay_seed_sequence_record():
+    game = play(np.random.SeedSequence(0).spawn(1)[0])
+    assert game.record.seed is None
+    assert_replays(game)
+
+def test_replay_seeded_record():
+    game = play(7)
+    assert game.record.seed == 7
+    assert_replays(game)
+
+def test_log_all_plays_the_same_game(caplog):
+    caplog.set_level(logging.CRITICAL)
+    quiet = play(3)
+    logged = play(3, log_all=True)
+    assert quiet.record.events == logged.record.events
+
+def test_drafts_to_the_same_country_are_merged():
+    from risk import game_record
+    game = play(5)
+    drafts = [payload for opcode, payload in game.record.iter_events() if opcode == game_record.DRAFT]
+    # PlayerHeuristic drafts one soldier at a time
+    assert any(n_soldiers > 1 for _, n_soldiers in drafts)
+
+# a snapshot between two drafts to the same country, the second draft must not be merged
+# into the recorded first one, the restored record would keep it
+def test_record_continues_after_restore():
+    from risk.game import GamePlayState
+    game = Game(make_players(), display_map=False, log_all=False, seed=4, record=True, stop_without_rl=False, max_rounds=20)
+    while not (game.current_phase == GamePlayState.DRAFT and game.current_player.unassigned_soldiers >= 2):
+        for _ in game.phase_steps():
+            pass
+        game.next_phase()
+
+    player = game.current_player
+    country = player.countries[0]
+    game.assign_soldiers(player, country, 1)
+    snapshot = game.snapshot()
+    game.assign_soldiers(player, country, 1)
+    game.restore(snapshot)
+    game.gameplay_loop()
+    assert_replays(game)
@@ -0,0 +1,46 @@
+import warnings
+import pytest
+import torch
+
+from risk.gcn import StaticGCNConv
+from risk.player_rl import RiskGNN
+from risk.topology import get_topology
+from risk.train_rl import make_model
+
+def test_model_buffers_own_writable_copies():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        model = make_model('cpu')
+    for name, buffer in model.named_buffers():
+        assert buffer.numpy().flags.writeable, name
+
+def test_static_gcn_conv_matches_gcn_conv():
+    GCNConv = pytest.importorskip('torch_geometric.nn').GCNConv
+
+    torch.manual_seed(0)
+    edge_index = torch.tensor(get_topology().edge_index)
+    num_nodes = int(edge_index.max()) + 1
+    sparse = GCNConv(14, 64)
+    torch.nn.init.normal_(sparse.bias)
+    dense = StaticGCNConv(14, 64, edge_index, num_nodes)
+    dense.load_state_dict(sparse.state_dict())
+
+    x = torch.randn(3, num_nodes, 14)
+    expected = torch.stack([sparse(graph, edge_index) for graph in x])
+    assert torch.allclose(dense(x), expected, atol=1e-5)
+    assert torch.allclose(dense(x[0]), expected[0], atol=1e-5)
+
+# checkpoints of the torch_geometric model load into the dense one and give the same logits
+def test_dense_model_loads_gcn_conv_checkpoints():
+    pytest.importorskip('torch_geometric')
+
+    torch.manual_seed(0)
+    sparse = RiskGNN(in_channels_node=14, hidden_dim=64, num_actions=493, dense=False)
+    dense = RiskGNN(in_channels_node=14, hidden_dim=64, num_actions=493, dense=True)
+    assert list(sparse.state_dict()) == list(dense.state_dict())
+    dense.load_state_dict(sparse.state_dict())
+
+    x = torch.randn(4, 42, 14)
+    with torch.no_grad():
+        expected = torch.stack([sparse(graph) for graph in x])
+        assert torch.allclose(dense(x), expected, atol=1e-5)
@@ -0,0 +1,58 @@
+import pickle
+import numpy as np
+import pytest
+import torch
+
+from risk.experience_shards import discounted_returns
+from risk.rollout_buffer import RolloutBuffer
+from risk.train_rl import compute_discounted_rewards
+
+NUM_ACTIONS = 493 # not a multiple of 8, the packed masks have padding bits
+
+def fill(buffer, num_steps, rng, episode=0):
+    steps = []
+    for i in range(num_steps):
+        step = (rng.normal(size=(42, 14)) * 10, rng.random(NUM_ACTIONS) < 0.3, int(rng.integers(NUM_ACTIONS)), float(rng.normal()), float(rng.normal()))
+        buffer.add(*step, player=i % 2, episode=episode)
+        steps.append(step)
+    return steps
+
+@pytest.mark.parametrize('features_dtype', [np.float32, np.float16])
+def test_round_trip(features_dtype):
+    rng = np.random.default_rng(0)
+    buffer = RolloutBuffer(capacity=4, features_dtype=features_dtype)
+    steps = fill(buffer, 10, rng) # grows past the initial capacity
+
+    assert len(buffer) == 10
+    assert buffer.arrays['node_features'].dtype == features_dtype
+    masks = buffer.valid_action_masks()
+    tensors = buffer.tensors()
+    assert tensors['node_features'].dtype == torch.float32
+    for i, (node_features, mask, action_idx, reward, log_prob) in enumerate(steps):
+        assert np.array_equal(masks[i], mask)
+        assert np.array_equal(tensors['node_features'][i].numpy(), node_features.astype(features_dtype).astype(np.float32))
+        assert tensors['action_idx'][i] == action_idx
+        assert tensors['reward'][i] == reward
+        assert tensors['log_prob'][i] == pytest.approx(log_prob)
+        assert tensors['player'][i] == i % 2
+
+def test_concatenate_and_pickle():
+    rng = np.random.default_rng(1)
+    first, second = RolloutBuffer(features_dtype=np.float16), RolloutBuffer(features_dtype=np.float16)
+    fill(first, 3, rng)
+    fill(second, 5, rng)
+    buffer = RolloutBuffer.concatenate([first, second], episode=7)
+    assert len(buffer) == 8 and buffer.features_dtype == np.float16
+    assert np.all(buffer.arrays['episode'][:8] == 7)
+    assert np.array_equal(buffer.valid_action_masks(), np.concatenate([first.valid_action_masks(), second.valid_action_masks()]))
+
+    unpickled = pickle.loads(pickle.dumps(buffer))
+    assert unpickled.capacity == len(unpickled) == 8
+    for name, array in buffer.arrays.items():
+        assert np.array_equal(unpickled.arrays[name], array[:8])
+
+def test_discounted_returns():
+    rewards = [1.0, 0.0, 2.0, -4.0]
+    expected = [1 + 0.5 * 0 + 0.25 * 2 + 0.125 * -4, 0 + 0.5 * 2 + 0.25 * -4, 2 + 0.5 * -4, -4]
+    assert discounted_returns(np.array(rewards), 0.5) == pytest.approx(expected)
+    assert compute_discounted_rewards(rewards, 0.5) == pytest.approx(expected)
@@ -0,0 +1,13 @@
+import pytest
+import torch
+
+from risk.self_play import SelfPlayPool
+from risk.train_rl import make_model, make_training_players
+
+def test_episodes_raise_when_a_worker_died():
+    torch.manual_seed(0)
+    with SelfPlayPool(make_model('cpu'), make_training_players, num_workers=1) as pool:
+        pool.workers[0].terminate()
+        pool.workers[0].join()
+        with pytest.raises(RuntimeError, match="worker 0 exited"):
+            next(pool.episodes(1, poll_interval=0.1))
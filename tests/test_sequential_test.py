@@ -0,0 +1,50 @@
+import math
+import pytest
+
+from risk.sequential_test import SPRT, wilson_interval
+
+def play(sprt, results):
+    for won in results:
+        sprt.update(won)
+    return sprt
+
+def test_bounds():
+    sprt = SPRT.around(0.5, 0.1, alpha=0.05, beta=0.05)
+    assert (sprt.p0, sprt.p1) == pytest.approx((0.4, 0.6))
+    assert sprt.upper == pytest.approx(math.log(19))
+    assert sprt.lower == pytest.approx(-math.log(19))
+
+def test_winning_sequence_accepts_above():
+    # every win adds log(0.6 / 0.4), the 8th crosses log(19)
+    sprt = play(SPRT.around(0.5, 0.1), [True] * 7)
+    assert sprt.decision is None
+    sprt.update(True)
+    assert sprt.decision == 'above'
+
+def test_losing_sequence_accepts_below():
+    sprt = play(SPRT.around(0.5, 0.1), [False] * 8)
+    assert sprt.decision == 'below'
+
+def test_mixed_results_stay_undecided():
+    sprt = play(SPRT.around(0.5, 0.1), [True, False] * 50)
+    assert sprt.decision is None
+    assert sprt.win_rate == 0.5
+
+def test_decision_is_latched():
+    sprt = play(SPRT.around(0.5, 0.1), [True] * 8 + [False] * 30)
+    assert sprt.decision == 'above'
+    assert (sprt.wins, sprt.games) == (8, 38)
+
+def test_low_threshold_decides_on_few_wins():
+    sprt = play(SPRT.around(0.2, 0.05), [True, False, False, False] * 20)
+    assert sprt.decision == 'above'
+
+@pytest.mark.parametrize('successes, trials, expected', [
+    (8, 10, (0.4902, 0.9433)),
+    (0, 10, (0.0, 0.2775)),
+    (10, 10, (0.7225, 1.0)),
+    (50, 100, (0.4038, 0.5962)),
+    (0, 0, (0.0, 1.0)),
+])
+def test_wilson_interval(successes, trials, expected):
+    assert wilson_interval(successes, trials) == pytest.approx(expected, abs=1e-4)
@@ -0,0 +1,19 @@
+import numpy as np
+
+from risk import game_record
+from risk.game import Game
+from risk.player_heuristic import PlayerHeuristic
+from risk.state_encoder import StateEncoder
+
+# the cached incremental encoders of the replayed game against a full encode of every position
+def test_incremental_encoding_matches_full_encoding():
+    players = [PlayerHeuristic(f"Player Heuristic {i}") for i in range(1, 6)]
+    game = Game(players, display_map=False, log_all=False, seed=11, record=True, stop_without_rl=False, max_rounds=40)
+    game.gameplay_loop()
+    opcodes = {opcode for opcode, _ in game.record.iter_events()}
+    assert {game_record.ATTACK, game_record.FORTIFY, game_record.TRADE_IN} <= opcodes
+
+    for replayed in Game.replay_steps(game.record):
+        for player in replayed.players:
+            incremental = replayed.get_game_state_encoded(player)
+            assert np.array_equal(incremental, StateEncoder(replayed, player).encode())
@@ -0,0 +1,15 @@
+import logging
+import pytest
+
+from risk.tournament import AgentSpec, load_results, run_tournament
+
+def test_failed_games_keep_the_finished_results(tmp_path, caplog):
+    caplog.set_level(logging.CRITICAL)
+    agents = [AgentSpec('heuristic', 'heuristic'), AgentSpec('random', 'random'), AgentSpec('broken', 'unknown kind')]
+    results_path = tmp_path / 'tournament.jsonl'
+    with pytest.raises(RuntimeError, match="4 tournament games failed"):
+        run_tournament(agents, str(results_path), num_matchups=3, players_per_game=2, num_workers=2, max_rounds=5)
+
+    results = load_results(results_path)
+    assert len(results) == 2
+    assert all('broken' not in result['seats'] for result in results)